@@ -1,10 +1,15 @@
 from abc import ABC, abstractmethod
-from collections import UserDict
-from datetime import datetime
-from itertools import islice
+from bisect import bisect_left, bisect_right, insort
+from calendar import isleap
+from collections import Counter, UserDict
+from collections.abc import Iterator, MutableMapping
+from datetime import date, datetime, timedelta
+from functools import wraps
+from indexes import BirthdayIndex, FieldIndexes, NameIndex, PhoneIndex, PrefixTrie, RankedList, TextIndex, TrigramIndex
 import re
 import os
 import json
+import sys
 
 
 dir_path = os.path.dirname(__file__)
@@ -25,17 +30,41 @@ class UserIO(ABC):
         pass
 
 class Console(UserIO):
+    answers = None  # prompt answers given in batch mode, None when the user types them
+    data_lock = None  # held by the running command, let go while it waits for the user
 
     def user_output(*output):
-        print(*output)
+        if len(output) == 1 and isinstance(output[0], Iterator):
+            # chunks from a generator go to the buffered stdout as they come
+            stream = sys.stdout
+            for count, chunk in enumerate(output[0]):
+                stream.write(chunk)
+                if not count:
+                    stream.flush()  # the first line appears at once
+            stream.write("\n")
+            stream.flush()
+        else:
+            print(*output)
         
     def user_input(*input_):
-        return input(*input_)
+        if Console.answers is None:
+            if Console.data_lock is None:
+                return input(*input_)
+            Console.data_lock.release()  # the autosave thread is not kept waiting on the keyboard
+            try:
+                return input(*input_)
+            finally:
+                Console.data_lock.acquire()
+        if not Console.answers:  # batch mode never waits for the keyboard
+            raise EOFError(*input_)
+        return Console.answers.popleft()
 
 
 class Field:
+    __slots__ = ("_value",)
+
     def __init__(self, value):
-        self.__value = None
+        self._value = None
         self.value = value
 
     def __str__(self) -> str:
@@ -47,6 +76,43 @@ class Field:
     def __eq__(self, other):
         return self.value == other.value
 
+    @classmethod
+    def trusted(cls, value):
+        # the value was validated before it was saved
+        field = cls.__new__(cls)
+        field._value = value
+        return field
+
+    @classmethod
+    def normalize_many(cls, values) -> tuple:
+        # normalized values and errors, None marks a missing entry in each list
+        normalized, errors = [], []
+        normalize = cls.normalize
+        for value in values:
+            try:
+                normalized.append(normalize(value))
+                errors.append(None)
+            except ValueError as err:
+                normalized.append(None)
+                errors.append(err)
+        return normalized, errors
+
+
+def date_code(value) -> int:
+    # dates are saved as day ordinals, 1 is 01.01.0001
+    return value.toordinal()
+
+
+def parse_date(value) -> datetime:
+    # a day ordinal, or a fixed layout string of older files, no need for strptime
+    if isinstance(value, int):
+        return datetime.fromordinal(value)
+    if value.isdigit():  # ordinal read back from a TEXT column
+        return datetime.fromordinal(int(value))
+    if value[4:5] == "-":  # YYYY-MM-DD[ HH:MM:SS], str(datetime)
+        return datetime(int(value[:4]), int(value[5:7]), int(value[8:10]))
+    return datetime(int(value[6:10]), int(value[3:5]), int(value[:2]))  # DD.MM.YYYY
+
 
 class Note:
     def __init__(self, text, tag=None, done=False):
@@ -54,12 +120,14 @@ class Note:
         self.done = done
         self.done_date = None
         self.text = text
-        self.tag_list = [tag] if tag else []
+        self.tag_list = (tag,) if tag else ()  # sorted by text
+        self.id = None  # given by NotePad.add_note
 
     def add_tag(self, tag):
         if tag not in self.tag_list:
-            self.tag_list.append(tag)
-            self.tag_list.sort()
+            tags = list(self.tag_list)
+            insort(tags, tag)
+            self.tag_list = tuple(tags)
 
     def __repr__(self) -> str:
         return str(self.text)
@@ -68,39 +136,85 @@ class Note:
         return self.text == other.text
     
     def to_dict(self) -> dict:
-        data = {"day":datetime.strftime(self.day, "%d.%m.%Y"),
+        data = {"id":self.id,
+                "day":date_code(self.day),
                 "done":self.done,
-                "done_date":(datetime.strftime(self.done_date, "%d.%m.%Y") if self.done_date else None),
+                "done_date":(date_code(self.done_date) if self.done_date else None),
                 "text":self.text, 
                 "tag_list":[str(tag) for tag in self.tag_list]}
         return data
     
-    def from_dict(self, data):
-        self.day = datetime.strptime(data["day"], "%d.%m.%Y")
+    def from_dict(self, data, pool=None):
+        self.day = parse_date(data["day"])
         self.done = data["done"]
         if data["done_date"]:
-            self.done_date = datetime.strptime(data["done_date"], "%d.%m.%Y"),
+            self.done_date = parse_date(data["done_date"]).date()
         self.text = data["text"]
-        self.tag_list = [HashTag(tag) for tag in data["tag_list"]]
+        tag = pool.get if pool is not None else HashTag
+        self.tag_list = tuple(tag(text) for text in data["tag_list"])
+        self.id = data.get("id")
 
 class HashTag:
+    # equal tags are the same object when they come from one TagPool
+    __slots__ = ("text", "uses")
+
     def __init__(self, tag) -> None:
         if "#" in tag:
             self.text = tag
         else:
             self.text = "#" + tag
+        self.uses = 0  # notes with this tag, kept by TagPool
 
     def __repr__(self) -> str:
         return self.text
 
-    def __eq__(self, other):
-        return self.text == other.text
-
     def __lt__(self, other):
         return self.text < other.text
 
 
+class TagPool:
+    # one HashTag per tag text for all notes of a NotePad
+    def __init__(self):
+        self.tags = {}  # tag text -> HashTag
+
+    def get(self, tag) -> HashTag:
+        text = tag.text if isinstance(tag, HashTag) else HashTag(tag).text
+        found = self.tags.get(text)
+        if found is None:
+            found = self.tags[text] = HashTag(text)
+        return found
+
+    def use(self, tag: HashTag) -> None:
+        tag.uses += 1
+
+    def release(self, tag: HashTag) -> None:
+        tag.uses -= 1
+        if not tag.uses:
+            self.tags.pop(tag.text, None)
+
+    def counts(self) -> list:
+        # (tag, uses) pairs, the most used tags first
+        return sorted(((tag, tag.uses) for tag in self.tags.values() if tag.uses), key=lambda item: (-item[1], item[0].text))
+
+
 class NotePad:
+    def __init__(self):
+        self.note_list = RankedList(self.tag_count)  # most tagged first
+        self.changes = []  # journal entries not committed yet
+        self.generation = 0  # bumped by every change, Autosave compares it with the saved one
+        self.journal_seq = 0
+        self.prefixes = None  # trie of the note texts, built on the first completion
+        self.text_counts = Counter()  # notes per text in the trie, a text leaves it with its last note
+        self.tags = {}  # tag text -> {note.id: note}
+        self.vocabulary = []  # sorted tag texts
+        self.tag_pool = TagPool()
+        self.by_id = {}  # note.id -> note
+        self.next_id = 1
+        self.words = TextIndex()
+        self.archive = None  # NoteArchive of the completed notes, set by load_data
+        self.restored = []  # IDs still in the archive file, erased once the journal has them back
+        self.erasing = []
+
     def load_from_file(self, note_file):
         try:
             with open(note_file, "r") as db:
@@ -109,68 +223,322 @@ class NotePad:
             pass
         for rec in notes["notes"]:
             note = Note("")
-            note.from_dict(rec)
+            note.from_dict(rec, self.tag_pool)
             self.note_list.append(note)
+        self.journal_seq = notes.get("journal", 0)
+        self.next_id = notes.get("next_id", 1)  # IDs of archived notes are not reused
+        self.prefixes = None
+        self.build_indexes()
                 
     def save_to_file(self, note_file):
         data = []
         for note in self.note_list:
             data.append(note.to_dict())
-        notebook = {"notes":data}
+        notebook = {"notes":data, "journal":self.journal_seq, "next_id":self.next_id}
         with open(note_file, "w") as db:
             json.dump(notebook, db)
+        self.changes = []
+
+    def _log(self, *entry):
+        self.generation += 1
+        self.journal_seq += 1
+        self.changes.append([self.journal_seq, *entry])
+
+    def journal_entries(self) -> list:
+        entries, self.changes = self.changes, []
+        self.erasing, self.restored = self.erasing + self.restored, []
+        return entries
+
+    def journal_written(self) -> None:
+        # the restored notes are on disk in the journal, their archive copies can go
+        for note_id in self.erasing:
+            self.archive.erase(note_id)
+        self.erasing = []
+
+    def apply_journal(self, entry) -> None:
+        seq, op, *args = entry
+        if seq <= self.journal_seq:  # already folded into the snapshot
+            return
+        if op == "add":
+            note = Note("")
+            note.from_dict(args[0])
+            self.add_note(note)
+        else:
+            # entries written before note IDs name the note by its text
+            note = self.find(args[0]) if isinstance(args[0], str) else self.get(args[0])
+            if op == "text":
+                self.change_note(note, args[1])
+            elif op == "done":
+                self.change_status(note, parse_date(args[1]).date())
+            elif op == "tag":
+                self.add_tag(note, HashTag(args[1]))
+            elif op == "del":
+                self.delete(note)
+            elif op == "archive":  # already written to the archive
+                self._drop(note)
+        self.journal_seq = seq
+
+    @staticmethod
+    def fold_journal(saved, entries) -> dict:
+        # apply_journal on the saved dicts; notes are kept by ID in the order of the note list
+        saved = saved or {"notes": [], "journal": 0, "next_id": 1}
+        seen = saved.get("journal", 0)
+        next_id = max(saved.get("next_id", 1), max((note.get("id") or 0 for note in saved["notes"]), default=0) + 1)
+        notes = {}
+        for note in sorted(saved["notes"], key=lambda note: -len(note["tag_list"])):  # as build_indexes
+            if note.get("id") is None or note["id"] in notes:  # saved before note IDs
+                note["id"] = next_id
+                next_id += 1
+            notes[note["id"]] = note
+        for seq, op, *args in entries:
+            if seq <= seen:
+                continue
+            seen = seq
+            if op == "add":
+                note = args[0]
+                if note.get("id") is None or note["id"] in notes:
+                    note["id"] = next_id
+                next_id = max(next_id, note["id"] + 1)
+                notes[note["id"]] = note
+                continue
+            if isinstance(args[0], str):  # entries written before note IDs
+                ranked = sorted(notes.values(), key=lambda note: -len(note["tag_list"]))
+                note = next((note for note in ranked if note["text"] == args[0]), None)
+            else:
+                note = notes.get(args[0])
+            if note is None:
+                continue
+            if op == "text":
+                note["text"] = args[1]
+            elif op == "done":
+                note["done"] = True
+                note["done_date"] = date_code(parse_date(args[1]).date())
+            elif op == "tag":
+                tag = str(HashTag(args[1]))
+                if tag not in note["tag_list"]:
+                    insort(note["tag_list"], tag)
+                    notes[note["id"]] = notes.pop(note["id"])  # refiled after its rank changed
+            elif op in ("del", "archive"):
+                del notes[note["id"]]
+        return {"notes": list(notes.values()), "journal": seen, "next_id": next_id}
+
+    def find(self, text):
+        for note in self.note_list:
+            if note.text == text:
+                return note
+
+    def get(self, note_id: int):
+        return self.by_id.get(note_id)
+
+    def complete(self, prefix: str, limit: int = None) -> list:
+        if self.prefixes is None:
+            self.text_counts = Counter(note.text for note in self.note_list)
+            self.prefixes = PrefixTrie(self.text_counts)
+        return self.prefixes.complete(prefix, limit)
+
+    def _remember_text(self, text) -> None:
+        if self.prefixes is not None:
+            self.text_counts[text] += 1
+            self.prefixes.add(text)
+
+    def _forget_text(self, text) -> None:
+        if self.prefixes is not None:
+            self.text_counts[text] -= 1
+            if not self.text_counts[text]:
+                del self.text_counts[text]
+                self.prefixes.discard(text)
+
+    def build_indexes(self) -> None:
+        self.tags = {}
+        self.by_id = {}
+        self.words = TextIndex()
+        self.next_id = max(self.next_id, max((note.id or 0 for note in self.note_list), default=0) + 1)
+        for note in self.note_list:
+            if note.id is None or note.id in self.by_id:  # saved before note IDs
+                note.id = self.next_id
+                self.next_id += 1
+            self.by_id[note.id] = note
+            self.words.add(note.id, note.text)
+            note.tag_list = tuple(self.tag_pool.get(tag) for tag in note.tag_list)
+            for tag in note.tag_list:
+                self.tags.setdefault(tag.text, {})[note.id] = note
+        for text, tag in list(self.tag_pool.tags.items()):
+            tag.uses = len(self.tags.get(text, ()))
+            if not tag.uses:
+                del self.tag_pool.tags[text]
+        self.vocabulary = sorted(self.tags)
+
+    def search(self, text: str) -> list:
+        # notes with every word of text, best match first, see TextIndex.search
+        keys = self.words.search(text)
+        if keys is None:  # no words to look up, e.g. only punctuation
+            return [note for note in self.note_list if text in str(note)]
+        return [self.by_id[key] for key in keys]
+
+    def _index_tag(self, note, tag: HashTag) -> None:
+        notes = self.tags.get(tag.text)
+        if notes is None:
+            notes = self.tags[tag.text] = {}
+            insort(self.vocabulary, tag.text)
+        if note.id not in notes:
+            notes[note.id] = note
+            self.tag_pool.use(tag)
+
+    def _unindex_tag(self, note, tag: HashTag) -> None:
+        notes = self.tags.get(tag.text)
+        if notes is None or notes.pop(note.id, None) is None:
+            return
+        self.tag_pool.release(tag)
+        if not notes:
+            del self.tags[tag.text]
+            del self.vocabulary[bisect_left(self.vocabulary, tag.text)]
+
+    def with_tag(self, tag) -> list:
+        return list(self.tags.get(str(HashTag(tag)), {}).values())
+
+    def tagged(self, prefix: str) -> list:
+        # notes with a tag starting with prefix, tags are taken from the sorted vocabulary
+        prefix = str(HashTag(prefix))
+        found = {}
+        for i in range(bisect_left(self.vocabulary, prefix), len(self.vocabulary)):
+            tag = self.vocabulary[i]
+            if not tag.startswith(prefix):
+                break
+            found.update(self.tags[tag])
+        return list(found.values())
 
-    note_list = []
+    @staticmethod
+    def tag_count(note) -> int:
+        return len(note.tag_list)
 
     def add_note(self, note):
-        i = 0
-        for rec in self.note_list:
-            if len(note.tag_list) <= len(rec.tag_list):
-                i = self.note_list.index(rec) + 1
-        self.note_list.insert(i, note)
+        if note.id is None or note.id in self.by_id:
+            note.id = self.next_id
+        self.next_id = max(self.next_id, note.id + 1)
+        self.note_list.append(note)
+        self.by_id[note.id] = note
+        self.words.add(note.id, note.text)
+        note.tag_list = tuple(self.tag_pool.get(tag) for tag in note.tag_list)
+        for tag in note.tag_list:
+            self._index_tag(note, tag)
+        self._remember_text(note.text)
+        self._log("add", note.to_dict())
 
     def change_note(self, note, new_note):
-        for rec in self.note_list:
-            if str(note) == str(rec):
-                rec.text = new_note
-
-    def change_status(self, note):
-        for rec in self.note_list:
-            if note == rec:
-                rec.done = True
-                rec.done_date = datetime.today().date()
-
-    def delete(self, note):
+        old_note = note.text
+        self.words.discard(note.id, old_note)
+        note.text = new_note
+        self.words.add(note.id, new_note)
+        self._forget_text(old_note)
+        self._remember_text(new_note)
+        self._log("text", note.id, new_note)
+
+    def change_status(self, note, done_date=None):
+        done_date = done_date or datetime.today().date()
+        note.done = True
+        note.done_date = done_date
+        self._log("done", note.id, date_code(done_date))
+
+    def add_tag(self, note, tag):
+        tag = self.tag_pool.get(tag)
+        if tag not in note.tag_list:
+            note.add_tag(tag)
+            self._index_tag(note, tag)
+            self.note_list.move(note)
+        self._log("tag", note.id, str(tag))
+
+    def _drop(self, note):
+        note = self.by_id.pop(note.id)
         self.note_list.remove(note)
+        self.words.discard(note.id, note.text)
+        for tag in note.tag_list:
+            self._unindex_tag(note, tag)
+        self._forget_text(note.text)
 
-    def sorting(self):
-        self.note_list.sort(key=lambda note: len(note.tag_list), reverse=True)
+    def delete(self, note):
+        self._drop(note)
+        self._log("del", note.id)
+
+    def archive_done(self, days: int) -> int:
+        # moves the notes done more than days ago to the archive
+        cutoff = date.today() - timedelta(days=days)
+        old = [
+            note
+            for note in self.note_list
+            if note.done and note.done_date and date(note.done_date.year, note.done_date.month, note.done_date.day) <= cutoff
+        ]
+        self.archive.add(old)
+        for note in old:
+            self._drop(note)
+            self._log("archive", note.id)
+        return len(old)
+
+    def archived(self, text: str = "") -> list:
+        # a note archived just before a crash may still be in the journal, that copy wins
+        notes = self.archive.search(text) if text else self.archive.load().values()
+        return [note for note in notes if note.id not in self.by_id]
+
+    def restore(self, note):
+        # back as not done, or the next archive_done would move it out again
+        note.done, note.done_date = False, None
+        self.add_note(note)
+        self.archive.take(note.id, erase=False)
+        self.restored.append(note.id)
 
 
 class Name(Field):
+    __slots__ = ()
+
+    @classmethod
+    def normalize(cls, value):
+        if not (value.isnumeric() or len(value) < 2):  # Name validation
+            return sys.intern(value)  # shared with the AddressBook keys
+        if languages:
+            raise ValueError(
+                "The name cannot consist only of numbers and the minimum length of the name is 2 characters."
+            )
+        else:
+            raise ValueError(
+                "Ім'я не може складатись тільки з цифр та мінімальна довжина імені 2 символа."
+            )
+
+    @classmethod
+    def trusted(cls, value):
+        field = cls.__new__(cls)
+        field._value = sys.intern(value)
+        return field
+
     @property
     def value(self):
-        return self.__value
+        return self._value
 
     @value.setter
     def value(self, value):
-        if not (value.isnumeric() or len(value) < 2):  # Name validation
-            self.__value = value
-        else:
-            if languages:
-                raise ValueError(
-                    "The name cannot consist only of numbers and the minimum length of the name is 2 characters."
-                )
-            else:
-                raise ValueError(
-                    "Ім'я не може складатись тільки з цифр та мінімальна довжина імені 2 символа."
-                )
+        self._value = self.normalize(value)
 
 
 class Birthday(Field):
-    def __init__(self, value):
-        self._value = None
-        self.value = value
+    __slots__ = ()
+    pattern = re.compile(r"(\d{1,2})([./])(\d{1,2})\2(\d{4})")  # DD.MM.YYYY or DD/MM/YYYY
+
+    @classmethod
+    def normalize(cls, value):
+        match = cls.pattern.fullmatch(value)
+        if match:
+            try:
+                return datetime(int(match[4]), int(match[3]), int(match[1]))
+            except ValueError:
+                pass
+        if languages:
+            raise ValueError("use the date format DD.MM.YYYY or DD/MM/YYYY")
+        else:
+            raise ValueError("використовуйте формат дати ДД.ММ.РРРР або ДД/ММ/РРРР")
+
+    @classmethod
+    def trusted(cls, value):
+        field = cls.__new__(cls)
+        field._value = parse_date(value) if isinstance(value, (str, int)) else value
+        return field
 
     @property
     def value(self):
@@ -178,92 +546,129 @@ class Birthday(Field):
 
     @value.setter
     def value(self, value):
-        try:
-            self._value = datetime.strptime(value, "%d.%m.%Y")  # Date validaiton "."
-        except ValueError:
-            try:
-                self._value = datetime.strptime(
-                    value, "%d/%m/%Y"
-                )  # Date validaiton "/"
-            except ValueError:
-                if languages:
-                    raise ValueError("use the date format DD.MM.YYYY or DD/MM/YYYY")
-                else:
-                    raise ValueError(
-                        "використовуйте формат дати ДД.ММ.РРРР або ДД/ММ/РРРР"
-                    )
+        self._value = self.normalize(value)
 
     def __str__(self) -> str:
         return datetime.strftime(self._value, "%d.%m.%Y")
 
 
 class Email(Field):
+    __slots__ = ()
+    pattern = re.compile(r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$")  # Email validation
+
+    @classmethod
+    def normalize(cls, value):
+        if cls.pattern.match(value):
+            return value
+        if languages:
+            raise ValueError("Invalid e-mail format")
+        else:
+            raise ValueError("Невірний формат e-mail")
+
     @property
     def value(self):
-        return self.__value
+        return self._value
 
     @value.setter
     def value(self, value):
-        pattern = (
-            # Email validation
-            r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$"
-        )
-        if re.match(pattern, value):
-            self.__value = value
-        else:
-            if languages:
-                raise ValueError("Invalid e-mail format")
-            else:
-                raise ValueError("Невірний формат e-mail")
+        self._value = self.normalize(value)
 
 
 class Address(Field):
+    __slots__ = ()
+
+    @classmethod
+    def normalize(cls, value):
+        if len(value) > 5:
+            return value
+        if languages:
+            raise ValueError("Address string must be at least 5 symbols long")
+        else:
+            raise ValueError("Адреса повинна бцти не меньше 5 символів довжиною")
+
     @property
     def value(self):
-        return self.__value
+        return self._value
 
     @value.setter
     def value(self, value):
-        if len(value) > 5:
-            self.__value = value
-        else:
-            if languages:
-                raise ValueError("Address string must be at least 5 symbols long")
-            else:
-                raise ValueError("Адреса повинна бцти не меньше 5 символів довжиною")
+        self._value = self.normalize(value)
 
 
 class Phone(Field):
+    __slots__ = ()
     min_len = 9
     max_len = 13
+    non_digits = re.compile(r"\D+")
+    prefixes = {9: "+380", 10: "+38", 12: "+"}  # country code missing for 9 and 10 digits
+    packed = re.compile(r"\+[0-9]{12}")  # the normalized number
+
+    @classmethod
+    def error(cls) -> ValueError:
+        if languages:
+            return ValueError(
+                f"\nYou entered the wrong phone number format.\n Try again!\n Minimum number of characters: {Phone.min_len}.\n Maximum: {Phone.max_len}."
+            )
+        else:
+            return ValueError(
+                f"\nВи ввели невірний формат номера.\n Спробуйте знову!\n Мінімальна к-сть символів:{Phone.min_len}.\n Максимальна:{Phone.max_len}."
+            )
+
+    @classmethod
+    def normalize(cls, number):
+        number = cls.non_digits.sub("", number)
+        prefix = cls.prefixes.get(len(number))
+        if prefix is None:
+            raise cls.error()
+        return prefix + number
+
+    @classmethod
+    def normalize_many(cls, numbers) -> tuple:
+        digits = [cls.non_digits.sub("", number) for number in numbers]
+        prefixes = [cls.prefixes.get(len(number)) for number in digits]
+        normalized = [None if prefix is None else prefix + number for prefix, number in zip(prefixes, digits)]
+        errors = [cls.error() if prefix is None else None for prefix in prefixes]
+        return normalized, errors
+
+    # the normalized number is always "+" and 12 digits, kept packed in an int
+    @classmethod
+    def trusted(cls, value):
+        if not cls.packed.fullmatch(value):  # edited by hand, checked like user input
+            return cls(value)
+        field = cls.__new__(cls)
+        field._value = int(value[1:])
+        return field
 
     @property
     def value(self):
-        return self.__value
+        return f"+{self._value:012d}"
 
     @value.setter
     def value(self, number):
-        number = re.sub("\D+", "", number)
-        if len(number) == 12:
-            number = "+" + number
-        elif len(number) == 10:
-            number = "+38" + number
-        elif len(number) == 9:
-            number = "+380" + number
-        else:
-            if languages:
-                raise ValueError(
-                    f"\nYou entered the wrong phone number format.\n Try again!\n Minimum number of characters: {Phone.min_len}.\n Maximum: {Phone.max_len}."
-                )
-            else:
-                raise ValueError(
-                    f"\nВи ввели невірний формат номера.\n Спробуйте знову!\n Мінімальна к-сть символів:{Phone.min_len}.\n Максимальна:{Phone.max_len}."
-                )
+        self._value = int(self.normalize(number)[1:])
 
-        self.__value = number
+
+def reindex(method):
+    # keeps the indexes of the AddressBook in sync with Record mutators
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.book is not None:
+            self.book._unindex_record(self)
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.rendered = None
+            if self.book is not None:
+                self.book._index_record(self)
+
+    return wrapper
 
 
 class Record:
+    __slots__ = ("book", "name", "phones", "birthday", "email", "address", "rendered")
+    render_hits = 0
+    render_misses = 0
+
     def __init__(
         self,
         name: Name,
@@ -272,6 +677,7 @@ class Record:
         address: Address = None,
         birthday: Birthday = None,
     ):
+        self.book = None
         self.name = name
         self.phones = []
         if phone:
@@ -279,8 +685,14 @@ class Record:
         self.birthday = birthday
         self.email = email
         self.address = address
+        self.rendered = None  # (languages, line), cleared by every mutator
 
     def __str__(self):
+        rendered = self.rendered
+        if rendered is not None and rendered[0] == languages:
+            Record.render_hits += 1
+            return rendered[1]
+        Record.render_misses += 1
         if languages:
             line = "{}: Phones: {}; E-mail: {}; Date of birth: {}; Address: {} \n"
         else:
@@ -288,42 +700,82 @@ class Record:
         address = self.address if self.address else "-"
         email = self.email if self.email else "-"
         birthday = self.birthday if self.birthday else "-"
-        return line.format(
+        line = line.format(
             self.name,
             ", ".join([str(phone) for phone in self.phones]),
             email,
             birthday,
             address,
         )
+        self.rendered = (languages, line)
+        return line
 
-    def __repr__(self):
-        if languages:
-            line = "{}: Phones: {}; E-mail: {}; Date of birth: {}; Address: {} \n"
+    __repr__ = __str__
+
+    @classmethod
+    def render_stats(cls) -> tuple:
+        # hits, misses and hit rate in percent of the rendering cache
+        total = cls.render_hits + cls.render_misses
+        return cls.render_hits, cls.render_misses, (100 * cls.render_hits / total if total else 0.0)
+
+    def to_dict(self) -> dict:
+        data = {"name":self.name.value,
+                "phones":[phone.value for phone in self.phones],
+                "email":self.email.value if self.email else None,
+                "address":self.address.value if self.address else None,
+                "birthday":date_code(self.birthday.value) if self.birthday else None}
+        return data
+
+    @classmethod
+    def from_dict(cls, data, trusted=False):
+        if trusted:
+            field = lambda kind, value: kind.trusted(value)
         else:
-            line = "{}: Телефони: {}; E-mail: {}; Дата народження: {}; Адреса: {} \n"
-        email = self.email if self.email else "-"
-        address = self.address if self.address else "-"
-        birthday = self.birthday if self.birthday else "-"
-        return line.format(
-            self.name,
-            ", ".join([str(phone) for phone in self.phones]),
-            email,
-            birthday,
-            address,
-        )
+            field = lambda kind, value: kind(value)
+        email = field(Email, data["email"]) if data["email"] else None
+        address = field(Address, data["address"]) if data["address"] else None
+        # saved birthdays are ordinals or older layouts, not user input
+        birthday = Birthday.trusted(data["birthday"]) if data["birthday"] else None
+        record = cls(field(Name, data["name"]), email=email, address=address, birthday=birthday)
+        if trusted:
+            record.phones = [Phone.trusted(phone) for phone in data["phones"]]
+        else:
+            for phone in data["phones"]:
+                record.add_phone(Phone(phone))
+        return record
+
+    @staticmethod
+    def raw_search_fields(data) -> list:
+        fields = [data["name"], *data["phones"]]
+        if data["email"]:
+            fields.append(data["email"])
+        if data["address"]:
+            fields.append(data["address"])
+        return fields
+
+    def search_fields(self) -> list:
+        fields = [self.name.value]
+        fields.extend(str(phone) for phone in self.phones)
+        if self.email:
+            fields.append(self.email.value)
+        if self.address:
+            fields.append(self.address.value)
+        return fields
 
     def days_to_birthday(self) -> int:
         if not self.birthday:
             return 1000000
-        today = datetime.today()
-        compare = self.birthday.value.replace(year=today.year)
-        days = int((compare - today).days)
-        if days >= 0:
-            return days
-        else:
-            days = int((compare.replace(year=today.year + 1) - today).days)
-            return days
+        today = date.today()
+        born = self.birthday.value
+        for year in (today.year, today.year + 1):
+            if born.month == 2 and born.day == 29 and not isleap(year):
+                compare = date(year, 3, 1)
+            else:
+                compare = date(year, born.month, born.day)
+            if compare >= today:
+                return (compare - today).days
 
+    @reindex
     def add_email(self, email: Email):
         if not self.email:
             self.email = email
@@ -333,14 +785,18 @@ class Record:
             else:
                 raise IndexError("E-mail вже введений")
 
+    @reindex
     def add_phone(self, phone: Phone):
         if phone in self.phones:
             if languages:
                 raise IndexError("This phone number already exists")
             else:
                 raise IndexError("Цей номер телефону вже існує")
+        if self.book is not None:
+            self.book.check_phone(phone, self)
         self.phones.append(phone)
 
+    @reindex
     def add_address(self, adres: Address):
         if not self.address:
             self.address = adres
@@ -350,6 +806,7 @@ class Record:
             else:
                 raise IndexError("Адреса вже введена")
 
+    @reindex
     def add_birthday(self, birthday: Birthday):
         if not self.birthday:
             self.birthday = birthday
@@ -379,6 +836,7 @@ class Record:
                 output += f"{i}: {phone} "
             return output
 
+    @reindex
     def change_email(self, email: str):
         self.email = Email(email)
 
@@ -394,6 +852,7 @@ class Record:
             else:
                 return f"Поточний e-mail {self.email}"
 
+    @reindex
     def change_birthday(self, new_birthday: Birthday):
         if not self.birthday:
             if languages:
@@ -402,6 +861,7 @@ class Record:
                 raise IndexError("Дата народження ще не введена")
         self.birthday = new_birthday
 
+    @reindex
     def change_address(self, new_address: Address):
         if not self.address:
             self.address = new_address
@@ -417,6 +877,19 @@ class Record:
             else:
                 return f"Змінено адресу з {old_address} на {new_address}"
 
+    @reindex
+    def del_email(self):
+        self.email = None
+
+    @reindex
+    def del_address(self):
+        self.address = None
+
+    @reindex
+    def del_birthday(self):
+        self.birthday = None
+
+    @reindex
     def del_phone(self, num=1):
         if not self.phones:
             if languages:
@@ -426,6 +899,7 @@ class Record:
         else:
             return self.phones.pop(num - 1)
 
+    @reindex
     def edit_phone(self, phone_new: Phone, num=1):
         if not self.phones:
             if languages:
@@ -433,11 +907,94 @@ class Record:
             else:
                 raise IndexError("В цього контакта немає збережених номерів телефону")
         else:
+            if self.book is not None:
+                self.book.check_phone(phone_new, self)
             self.phones.pop(num - 1)
             self.phones.insert(num - 1, phone_new)
 
 
+class LazyContacts(MutableMapping):
+    # AddressBook.data, keeps loaded dicts until the contact is accessed
+    def __init__(self, book):
+        self.book = book
+        self.items = {}
+
+    def __getitem__(self, key):
+        item = self.items[key]
+        if type(item) is dict:
+            item = Record.from_dict(item, trusted=True)
+            item.book = self.book
+            self.items[key] = item
+        return item
+
+    def __setitem__(self, key, value):
+        self.items[key] = value
+
+    def __delitem__(self, key):
+        del self.items[key]
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def raw(self, key) -> dict:
+        item = self.items[key]
+        return item if type(item) is dict else item.to_dict()
+
+
+class Cursor:
+    # pages of records; keeps its position, so a full walk is O(N)
+    def __init__(self, book, page, by_name=False, after=None):
+        self.book = book
+        self.page = page
+        self.by_name = by_name
+        self.keys = sorted(book.data) if by_name else list(book.data)
+        self.position = 0
+        self.key = None  # last key returned, the cursor can be resumed after it
+        if after is not None:
+            self.seek(after)
+
+    def seek(self, key) -> None:
+        if self.by_name:
+            self.position = bisect_right(self.keys, key)
+        else:
+            self.position = self.keys.index(key) + 1
+        self.key = key
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> list:
+        records = []
+        while self.position < len(self.keys) and len(records) < self.page:
+            key = self.keys[self.position]
+            self.position += 1
+            if key in self.book.data:  # skip contacts removed since the cursor was made
+                records.append(self.book.data[key])
+                self.key = key
+        if not records:
+            raise StopIteration
+        return records
+
+
 class AddressBook(UserDict):
+    def __init__(self, *args, lazy=False, **kwargs):
+        self.lazy = lazy
+        self.trigrams = TrigramIndex()
+        self.birthdays = BirthdayIndex()
+        self.numbers = PhoneIndex()
+        self.names = NameIndex()
+        self.fields = FieldIndexes()
+        self.changed = set()  # keys of records not committed to the journal yet
+        self.generation = 0  # bumped by every change, Autosave compares it with the saved one
+        super().__init__(*args, **kwargs)
+        self.data = LazyContacts(self)
+
     def load_from_file(self, filename) -> None:
         try:
             with open(filename, "r") as db:
@@ -445,65 +1002,188 @@ class AddressBook(UserDict):
         except EOFError:
             pass
         for rec in data:
-            name = Name(data[rec]['name'])
-            email = None if not data[rec]['email'] else Email(data[rec]['email'])
-            address = None if not data[rec]['address'] else Address(data[rec]['address'])
-            birthday = None if not data[rec]['birthday'] else Birthday(data[rec]['birthday'])
-            record  = Record(name, email, address, birthday)
-            for phone in data[rec]['phones']:
-                record.add_phone(phone)
-            self.data.update({record.name.value: record})  
-            
-            
+            self._put_raw(data[rec])  # saved data, a number shared by two contacts is not refused here
+        self.changed = set()
+
     def save_to_file(self, filename) -> None:
         data = {}
-        for rec in self.data.values():
-            phones = [str(phone) for phone in rec.phones]
-            email = rec.email.value if rec.email is not None else None 
-            address = rec.address.value if rec.address is not None else None
-            birthday = str(rec.birthday.value) if rec.birthday is not None else None
-            data_value = {rec.name.value:{"name":rec.name.value, 
-                                          "phones":phones, 
-                                          "email":email,
-                                          "address":address,
-                                          "birthday":birthday}}
-            data.update(data_value)
+        for key in self.data:
+            data.update({key: self.data.raw(key)})
         with open(filename, "w") as db:
             json.dump(data, db)
+        self.changed = set()
+
+    def journal_entries(self) -> list:
+        entries = []
+        for key in self.changed:
+            entries.append(["put", self.data.raw(key)] if key in self.data else ["del", key])
+        self.changed = set()
+        return entries
+
+    def journal_written(self) -> None:
+        pass
+
+    def apply_journal(self, entry) -> None:
+        op, value = entry
+        if op == "put":
+            if value["name"] in self.data:
+                self.remove_record(value["name"])
+            # intermediate states of one commit may share a phone, skip the check
+            self._put_raw(value)
+        elif value in self.data:
+            self.remove_record(value)
+
+    @staticmethod
+    def fold_journal(saved, entries) -> dict:
+        # apply_journal on the saved dicts, the compaction thread builds no records or indexes
+        data = saved or {}
+        for op, value in entries:
+            if op == "put":
+                data.pop(value["name"], None)  # a changed contact goes last, as in the book
+                data[value["name"]] = value
+            else:
+                data.pop(value, None)
+        return data
+
+    def _put_raw(self, data: dict) -> None:
+        if self.lazy:
+            if not all(Phone.packed.fullmatch(phone) for phone in data["phones"]):
+                data["phones"] = [Phone.trusted(phone).value for phone in data["phones"]]
+            self.data[data["name"]] = data
+            birthday = parse_date(data["birthday"]) if data["birthday"] else None
+            self._index(
+                data["name"],
+                Record.raw_search_fields(data),
+                birthday,
+                data["phones"],
+                data["email"],
+                data["address"],
+            )
+        else:
+            record = Record.from_dict(data, trusted=True)
+            self.data[data["name"]] = record
+            record.book = self
+            self._index_record(record)
+
+    def _index(self, key, fields, birthday, phones, email, address) -> None:
+        self.trigrams.add(key, fields)
+        self.names.add(key)
+        self.fields.add(key, birthday, phones, email, address)
+        if birthday:
+            self.birthdays.add(key, birthday)
+        for phone in phones:
+            self.numbers.add(key, phone)
+
+    def _unindex(self, key, fields, birthday, phones, email, address) -> None:
+        self.trigrams.discard(key, fields)
+        self.names.discard(key)
+        self.fields.discard(key, birthday, phones, email, address)
+        if birthday:
+            self.birthdays.discard(key, birthday)
+        for phone in phones:
+            self.numbers.discard(key, phone)
+
+    def _touch(self, key) -> None:
+        self.changed.add(key)
+        self.generation += 1
+
+    def _index_record(self, record: Record) -> None:
+        self._touch(record.name.value)
+        self._index(
+            record.name.value,
+            record.search_fields(),
+            record.birthday.value if record.birthday else None,
+            [phone.value for phone in record.phones],
+            record.email.value if record.email else None,
+            record.address.value if record.address else None,
+        )
+
+    def _unindex_record(self, record: Record) -> None:
+        self._unindex(
+            record.name.value,
+            record.search_fields(),
+            record.birthday.value if record.birthday else None,
+            [phone.value for phone in record.phones],
+            record.email.value if record.email else None,
+            record.address.value if record.address else None,
+        )
+
+    def phone_owners(self, phone: str) -> list:
+        return [self.data[key] for key in self.numbers.owners_of(phone)]
+
+    def check_phone(self, phone: Phone, record: Record) -> None:
+        owner = self.numbers.owner(phone.value)
+        if owner is not None and owner != record.name.value:
+            if languages:
+                raise IndexError(f"This phone number already belongs to {owner}")
+            else:
+                raise IndexError(f"Цей номер телефону вже належить контакту {owner}")
 
     def add_record(self, record: Record) -> None:
+        for phone in record.phones:
+            self.check_phone(phone, record)
+        old = self.data.get(record.name.value)
+        if old is not None:
+            self._unindex_record(old)
+            old.book = None
         self.data.update({record.name.value: record})
+        record.book = self
+        self._index_record(record)
 
     def remove_record(self, contact: str) -> None:
-        return self.data.pop(contact)
+        record = self.data.pop(contact)
+        self._unindex_record(record)
+        self._touch(contact)
+        record.book = None
+        return record
 
     def lening(self) -> int:
         return len(self.data)
 
-    def iterator(self, page) -> str:
-        start = 0
-        while True:
-            output = ""
-            for i in islice(self.data.values(), start, start + page):
-                output += str(i)
-            if not output:
-                break
-            yield output
-            start += page
+    def iterator(self, page, by_name=False, after=None):
+        return Cursor(self, page, by_name, after)
 
-    def show_all(self) -> str:
-        output = ""
-        for contact in self.data.values():
-            output += str(contact)
+    def show_all(self, by_name=False) -> Iterator:
+        keys = sorted(self.data) if by_name else list(self.data)
+        for key in keys:
+            yield str(self.data[key])
         if languages:
-            output += f"Total: {len(self.data)} contacts."
+            yield f"Total: {len(self.data)} contacts."
         else:
-            output += f"Всього: {len(self.data)} контактів."
-        return output
+            yield f"Всього: {len(self.data)} контактів."
+
+    def find_phone(self, number: str) -> list:
+        digits = re.sub(r"\D+", "", number)
+        prefix = Phone.prefixes.get(len(digits))
+        if prefix is not None:  # a whole number
+            phones = [prefix + digits]
+        else:  # the end of a number, or digits that no whole number has
+            phones = self.numbers.lookup(digits)
+        found = []
+        for phone in phones:
+            for owner in self.phone_owners(phone):
+                found.append((phone, owner))
+        return found
+
+    def birthdays_within(self, days: int) -> list:
+        keys = self.birthdays.window(date.today(), days)
+        return [self.data[key] for key in keys]
+
+    def complete(self, prefix: str, limit: int = None) -> list:
+        # names starting with prefix, for tab completion
+        return self.names.complete(prefix, limit)
+
+    def find(self, name: str, limit: int = 10) -> list:
+        # contacts with names closest to name, for typos and other spellings
+        return [self.data[key] for key in self.names.closest(name, limit)]
 
     def search(self, pattern: str) -> list:
+        candidates = self.trigrams.candidates(pattern)
+        if candidates is None:  # shorter than a trigram, full scan
+            candidates = self.data.keys()
         found_recs = []
-        for contact in self.data.values():
-            if pattern in str(contact):
+        for key in sorted(candidates):
+            contact = self.data[key]
+            if any(pattern in field for field in contact.search_fields()):
                 found_recs.append(contact)
         return found_recs
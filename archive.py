@@ -0,0 +1,80 @@
+"""completed notes moved out of NotePad, read only when they are asked for"""
+from ab_classes import Note
+from indexes import TextIndex
+import json
+import os
+
+
+class NoteArchive:
+    # JSON lines file: a note dict per archived note, {"restored": id} when it is taken back
+    def __init__(self, path: str):
+        self.path = path
+        self.notes = None  # note.id -> note, read on first use
+        self.words = None
+
+    def read(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as archive:
+            for line in archive:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:  # torn write of the last line
+                    break
+                if "restored" in entry:
+                    yield entry["restored"], None
+                else:
+                    note = Note("")
+                    note.from_dict(entry)
+                    yield note.id, note
+
+    def write(self, notes: list) -> None:
+        with open(self.path, "a", encoding="utf-8") as archive:
+            for note in notes:
+                archive.write(json.dumps(note.to_dict(), ensure_ascii=False, separators=(",", ":")) + "\n")
+            archive.flush()
+            os.fsync(archive.fileno())
+
+    def erase(self, note_id: int) -> None:
+        with open(self.path, "a", encoding="utf-8") as archive:
+            archive.write(json.dumps({"restored": note_id}) + "\n")
+            archive.flush()
+            os.fsync(archive.fileno())
+
+    def load(self) -> dict:
+        if self.notes is None:
+            self.notes = {}
+            for note_id, note in self.read():
+                if note is None:
+                    self.notes.pop(note_id, None)
+                else:
+                    self.notes[note_id] = note
+            self.words = TextIndex()
+            for note_id, note in self.notes.items():
+                self.words.add(note_id, note.text)
+        return self.notes
+
+    def add(self, notes: list) -> None:
+        if not notes:
+            return
+        self.write(notes)
+        if self.notes is not None:
+            for note in notes:
+                self.notes[note.id] = note
+                self.words.add(note.id, note.text)
+
+    def take(self, note_id: int, erase: bool = True):
+        # erase=False leaves the file to a later erase(), the note is gone from memory either way
+        note = self.load().pop(note_id, None)
+        if note is not None:
+            self.words.discard(note_id, note.text)
+            if erase:
+                self.erase(note_id)
+        return note
+
+    def search(self, text: str) -> list:
+        notes = self.load()
+        keys = self.words.search(text)
+        if keys is None:
+            return [note for note in notes.values() if text in str(note)]
+        return [notes[key] for key in keys]
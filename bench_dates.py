@@ -0,0 +1,85 @@
+"""load time of saved dates: python bench_dates.py [records]
+
+Compares day ordinals with the older string layouts, both read by parse_date,
+and strptime, which read the strings before.
+"""
+from datetime import date, datetime, timedelta
+from timeit import repeat
+import json
+import os
+import random
+import sys
+import tempfile
+
+from ab_classes import AddressBook, Birthday, Note, NotePad, date_code, parse_date
+
+
+def best(func, runs: int = 3) -> float:
+    return min(repeat(func, number=1, repeat=runs))
+
+
+def notes(count: int, legacy: bool) -> dict:
+    start = datetime(2020, 1, 1)
+    rows = []
+    for i in range(count):
+        day = start + timedelta(days=random.randrange(2000), seconds=random.randrange(86400))
+        done = day.date() + timedelta(days=3) if i % 2 else None
+        rows.append(
+            {
+                "id": i + 1,
+                "day": str(day) if legacy else date_code(day),
+                "done": done is not None,
+                "done_date": (done.strftime("%d.%m.%Y") if legacy else date_code(done)) if done else None,
+                "text": f"note {i}",
+                "tag_list": [f"tag{i % 50}"],
+            }
+        )
+    return {"notes": rows, "journal": 0, "next_id": count + 1}
+
+
+def contacts(count: int, legacy: bool) -> dict:
+    data = {}
+    for i in range(count):
+        born = date(1950, 1, 1) + timedelta(days=random.randrange(20000))
+        data[f"Contact {i}"] = {
+            "name": f"Contact {i}",
+            "phones": [f"050{i:07}"],
+            "email": None,
+            "address": None,
+            "birthday": born.strftime("%d.%m.%Y") if legacy else date_code(born),
+        }
+    return data
+
+
+def main(count: int) -> None:
+    random.seed(1)
+    with tempfile.TemporaryDirectory() as folder:
+        for legacy in (False, True):
+            layout = "strings " if legacy else "ordinals"
+            note_data = notes(count, legacy)
+            note_file = os.path.join(folder, f"note_{legacy}.JSON")
+            with open(note_file, "w") as db:
+                json.dump(note_data, db)
+            book_file = os.path.join(folder, f"book_{legacy}.JSON")
+            with open(book_file, "w") as db:
+                json.dump(contacts(count, legacy), db)
+            birthdays = [row["birthday"] for row in contacts(count, legacy).values()]
+
+            def from_dicts():
+                for row in note_data["notes"]:
+                    Note("").from_dict(row)
+
+            print(f"{layout} Note.from_dict          {best(from_dicts):.3f} s")
+            print(f"{layout} NotePad.load_from_file  {best(lambda: NotePad().load_from_file(note_file)):.3f} s")
+            print(f"{layout} Birthday.trusted        {best(lambda: [Birthday.trusted(b) for b in birthdays]):.3f} s")
+            for lazy in (True, False):
+                kind = "lazy " if lazy else "eager"
+                load = lambda: AddressBook(lazy=lazy).load_from_file(book_file)
+                print(f"{layout} AddressBook {kind} load   {best(load):.3f} s")
+        days = [str(datetime(2020, 1, 1) + timedelta(days=i % 2000, seconds=i)) for i in range(count)]
+        print(f"parse_date of str(datetime)       {best(lambda: [parse_date(d) for d in days]):.3f} s")
+        print(f"strptime of str(datetime)         {best(lambda: [datetime.strptime(d, '%Y-%m-%d %H:%M:%S') for d in days]):.3f} s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
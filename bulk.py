@@ -0,0 +1,219 @@
+"""streaming import and export of contacts in CSV and vCard formats"""
+from ab_classes import Address, Birthday, Email, Name, Phone, Record, languages, parse_date
+from itertools import islice
+import csv
+import os
+
+
+FIELDS = ["name", "phones", "email", "address", "birthday"]
+BATCH = 1000
+
+
+def file_format(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".vcf", ".vcard"):
+        return "vcard"
+    if ext == ".csv":
+        return "csv"
+    if languages:
+        raise ValueError("Use a .csv or .vcf file")
+    else:
+        raise ValueError("Використовуйте файл .csv або .vcf")
+
+
+def read_csv(path: str):
+    with open(path, "r", newline="", encoding="utf-8") as src:
+        for row in csv.DictReader(src):
+            yield {
+                "name": (row.get("name") or "").strip(),
+                "phones": [p for p in (row.get("phones") or "").split(";") if p.strip()],
+                "email": (row.get("email") or "").strip() or None,
+                "address": (row.get("address") or "").strip() or None,
+                "birthday": (row.get("birthday") or "").strip() or None,
+            }
+
+
+def write_csv(path: str, rows) -> int:
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as dst:
+        writer = csv.DictWriter(dst, FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({**row, "phones": ";".join(row["phones"])})
+            count += 1
+    return count
+
+
+def vcard_unescape(value: str) -> str:
+    return value.replace("\\n", "\n").replace("\\N", "\n").replace("\\,", ",").replace("\\;", ";").replace("\\\\", "\\")
+
+
+def vcard_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace(",", "\\,").replace(";", "\\;").replace("\n", "\\n")
+
+
+def vcard_lines(src):
+    # unfolds continuation lines, which start with a space or a tab
+    line = None
+    for raw in src:
+        raw = raw.rstrip("\r\n")
+        if raw[:1] in (" ", "\t") and line is not None:
+            line += raw[1:]
+            continue
+        if line is not None:
+            yield line
+        line = raw
+    if line is not None:
+        yield line
+
+
+def read_vcard(path: str):
+    with open(path, "r", encoding="utf-8") as src:
+        card = None
+        for line in vcard_lines(src):
+            prop, _, value = line.partition(":")
+            prop = prop.split(";")[0].upper()
+            if "." in prop:  # item1.TEL grouping
+                prop = prop.split(".")[-1]
+            if prop == "BEGIN":
+                card = {"name": "", "phones": [], "email": None, "address": None, "birthday": None}
+            elif card is None:
+                continue
+            elif prop == "END":
+                yield card
+                card = None
+            elif prop == "FN":
+                card["name"] = vcard_unescape(value).strip()
+            elif prop == "TEL":
+                card["phones"].append(value.strip())
+            elif prop == "EMAIL" and not card["email"]:
+                card["email"] = value.strip()
+            elif prop == "ADR" and not card["address"]:
+                parts = [vcard_unescape(part).strip() for part in value.replace("\\;", "\0").split(";")]
+                card["address"] = ", ".join(part.replace("\0", ";") for part in parts if part) or None
+            elif prop == "BDAY":
+                digits = value.strip().replace("-", "")
+                if len(digits) == 8 and digits.isdigit():
+                    card["birthday"] = f"{digits[6:8]}.{digits[4:6]}.{digits[:4]}"
+                else:
+                    card["birthday"] = value.strip()
+
+
+def write_vcard(path: str, rows) -> int:
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as dst:
+        for row in rows:
+            lines = ["BEGIN:VCARD", "VERSION:3.0", f"FN:{vcard_escape(row['name'])}", f"N:{vcard_escape(row['name'])};;;;"]
+            lines.extend(f"TEL:{phone}" for phone in row["phones"])
+            if row["email"]:
+                lines.append(f"EMAIL:{row['email']}")
+            if row["address"]:
+                lines.append(f"ADR:;;{vcard_escape(row['address'])};;;;")
+            if row["birthday"]:
+                day, month, year = row["birthday"][:2], row["birthday"][3:5], row["birthday"][6:10]
+                lines.append(f"BDAY:{year}-{month}-{day}")
+            lines.append("END:VCARD")
+            dst.write("\r\n".join(lines) + "\r\n")
+            count += 1
+    return count
+
+
+def validate_batch(batch: list) -> list:
+    # one normalize_many call per field, returns (fields, error) for every row
+    errors = [None] * len(batch)
+    names, name_errors = Name.normalize_many([row["name"] for row in batch])
+    columns = {}
+    for field, cls in (("email", Email), ("address", Address), ("birthday", Birthday)):
+        rows = [i for i, row in enumerate(batch) if row[field]]
+        values, field_errors = cls.normalize_many([batch[i][field] for i in rows])
+        columns[field] = dict(zip(rows, values))
+        for i, err in zip(rows, field_errors):
+            if err is not None and errors[i] is None:
+                errors[i] = err
+    owners = [i for i, row in enumerate(batch) for _ in row["phones"]]
+    phones, phone_errors = Phone.normalize_many([phone for row in batch for phone in row["phones"]])
+    row_phones = [[] for _ in batch]
+    for i, phone, err in zip(owners, phones, phone_errors):
+        if err is not None and errors[i] is None:
+            errors[i] = err
+        row_phones[i].append(phone)
+    result = []
+    for i, name in enumerate(names):
+        error = name_errors[i] or errors[i]
+        fields = None
+        if error is None:
+            fields = {
+                "name": name,
+                "phones": row_phones[i],
+                "email": columns["email"].get(i),
+                "address": columns["address"].get(i),
+                "birthday": columns["birthday"].get(i),
+            }
+        result.append((fields, error))
+    return result
+
+
+def make_record(book, fields: dict) -> Record:
+    # fields are already normalized by validate_batch
+    name = fields["name"]
+    if name in book.data:
+        if languages:
+            raise IndexError(f"Contact {name} already exists")
+        else:
+            raise IndexError(f"Контакт {name} вже існує")
+    record = Record(
+        Name.trusted(name),
+        email=Email.trusted(fields["email"]) if fields["email"] else None,
+        address=Address.trusted(fields["address"]) if fields["address"] else None,
+        birthday=Birthday.trusted(fields["birthday"]) if fields["birthday"] else None,
+    )
+    for phone in fields["phones"]:
+        record.add_phone(Phone.trusted(phone))
+    return record
+
+
+def import_contacts(book, path: str, reject_path: str, commit=None) -> tuple:
+    rows = read_vcard(path) if file_format(path) == "vcard" else read_csv(path)
+    imported = rejected = 0
+    line = 0
+    with open(reject_path, "w", newline="", encoding="utf-8") as rej:
+        rejects = csv.writer(rej)
+        rejects.writerow(["row", "error", *FIELDS])
+        while True:
+            batch = list(islice(rows, BATCH))
+            if not batch:
+                break
+            for row, (fields, error) in zip(batch, validate_batch(batch)):
+                line += 1
+                try:
+                    if error is not None:
+                        raise error
+                    book.add_record(make_record(book, fields))
+                    imported += 1
+                except (ValueError, IndexError) as err:
+                    rejected += 1
+                    rejects.writerow(
+                        [line, str(err).strip(), row["name"], ";".join(row["phones"]), row["email"], row["address"], row["birthday"]]
+                    )
+            if commit is not None:
+                commit()
+    if not rejected:
+        os.remove(reject_path)
+    return imported, rejected
+
+
+def export_rows(book):
+    # raw records keep birthdays as day ordinals, files get DD.MM.YYYY
+    for key in book.data:
+        row = book.data.raw(key)
+        if row["birthday"] is not None:
+            born = parse_date(row["birthday"])
+            row = {**row, "birthday": f"{born.day:02}.{born.month:02}.{born.year}"}
+        yield row
+
+
+def export_contacts(book, path: str) -> int:
+    rows = export_rows(book)
+    if file_format(path) == "vcard":
+        return write_vcard(path, rows)
+    return write_csv(path, rows)
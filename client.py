@@ -0,0 +1,92 @@
+"""client of server.py, one connection is kept open and reused for every command"""
+from server import parse_address
+from threading import Lock
+import socket
+import sys
+
+
+class MemoMindClient:
+    def __init__(self, address: str, timeout: float = 30.0):
+        self.address = address
+        self.timeout = timeout
+        self.sock = None
+        self.file = None
+        self.lock = Lock()  # one command at a time on the shared connection
+
+    def connect(self) -> None:
+        host, port = parse_address(self.address)
+        if port is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(host)
+        else:
+            sock = socket.create_connection((host, port), self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock = sock
+        self.file = sock.makefile("rwb")
+
+    def close(self) -> None:
+        if self.sock is not None:
+            self.file.close()
+            self.sock.close()
+            self.sock = self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stale(self) -> bool:
+        # the server closed the idle connection, found out before anything is sent
+        self.sock.setblocking(False)
+        try:
+            return self.sock.recv(1, socket.MSG_PEEK) == b""
+        except BlockingIOError:
+            return False
+        except OSError:
+            return True
+        finally:
+            self.sock.settimeout(self.timeout)
+
+    def _send(self, line: str) -> None:
+        self.file.write(line.replace("\n", " ").encode("utf-8") + b"\n")
+        self.file.flush()
+
+    def _receive(self):
+        lines = []
+        while True:
+            reply = self.file.readline()
+            if not reply:
+                raise ConnectionError("the server closed the connection")
+            reply = reply.decode("utf-8").rstrip("\n")
+            if reply in (".ok", ".error"):
+                return reply == ".ok", "\n".join(lines)
+            lines.append(reply[1:] if reply.startswith("..") else reply)
+
+    def execute(self, line: str):
+        # (ok, text) of a command; it is sent again only if it never reached the server,
+        # a command that may have run (a timeout while waiting for the reply) is not repeated
+        with self.lock:
+            if self.sock is not None and self.stale():
+                self.close()
+            if self.sock is None:
+                self.connect()
+            try:
+                self._send(line)
+            except OSError:
+                self.close()
+                self.connect()
+                self._send(line)
+            try:
+                return self._receive()
+            except OSError:
+                self.close()
+                raise
+
+if __name__ == "__main__":
+    # python client.py address command...
+    with MemoMindClient(sys.argv[1]) as client:
+        ok, text = client.execute(" ".join(sys.argv[2:]))
+    print(text)
+    sys.exit(0 if ok else 1)
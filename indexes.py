@@ -0,0 +1,689 @@
+"""indexes used by AddressBook and NotePad to avoid full scans"""
+from bisect import bisect_left, insort
+from calendar import isleap, monthrange
+from collections import defaultdict
+from datetime import timedelta
+import heapq
+import math
+import re
+
+
+class TrigramIndex:
+    def __init__(self):
+        self.index = defaultdict(set)
+
+    @staticmethod
+    def trigrams(text: str) -> set:
+        return {text[i : i + 3] for i in range(len(text) - 2)}
+
+    @staticmethod
+    def record_trigrams(texts) -> set:
+        return {text[i : i + 3] for text in texts for i in range(len(text) - 2)}
+
+    def add(self, key, texts) -> None:
+        index = self.index
+        for gram in self.record_trigrams(texts):
+            index[gram].add(key)
+
+    def discard(self, key, texts) -> None:
+        for gram in self.record_trigrams(texts):
+            keys = self.index.get(gram)
+            if keys is None:
+                continue
+            keys.discard(key)
+            if not keys:
+                del self.index[gram]
+
+    def candidates(self, pattern: str) -> set:
+        grams = self.trigrams(pattern)
+        if not grams:
+            return None  # pattern is too short for trigrams
+        postings = []
+        for gram in grams:
+            keys = self.index.get(gram)
+            if not keys:
+                return set()
+            postings.append(keys)
+        postings.sort(key=len)
+        result = set(postings[0])
+        for keys in postings[1:]:
+            result &= keys
+            if not result:
+                break
+        return result
+
+
+class BirthdayIndex:
+    # every month * 100 + day key of a leap year, in date order
+    DAY_KEYS = [month * 100 + day for month in range(1, 13) for day in range(1, monthrange(2000, month)[1] + 1)]
+
+    def __init__(self):
+        self.days = defaultdict(set)  # month * 100 + day -> keys
+
+    @staticmethod
+    def day_key(date) -> int:
+        return date.month * 100 + date.day
+
+    def add(self, key, date) -> None:
+        self.days[self.day_key(date)].add(key)
+
+    def discard(self, key, date) -> None:
+        day = self.day_key(date)
+        keys = self.days.get(day)
+        if keys is None:
+            return
+        keys.discard(key)
+        if not keys:
+            del self.days[day]
+
+    @classmethod
+    def ranges(cls, start, days: int) -> list:
+        # inclusive day key ranges from start to start + days, in date order
+        if days < 0:
+            return []
+        lo = cls.day_key(start)
+        if lo == 301 and not isleap(start.year):
+            lo = 229  # 29 February is celebrated on 1 March in common years
+        if days >= 365:
+            return [(lo, 1231), (101, lo - 1)]
+        end = start + timedelta(days=days)
+        if end.year == start.year:
+            return [(lo, cls.day_key(end))]
+        return [(lo, 1231), (101, cls.day_key(end))]
+
+    def window(self, start, days: int) -> list:
+        keys = []
+        for lo, hi in self.ranges(start, days):
+            first = bisect_left(self.DAY_KEYS, lo)
+            last = bisect_left(self.DAY_KEYS, hi + 1)
+            for day in self.DAY_KEYS[first:last]:
+                if day in self.days:
+                    keys.extend(sorted(self.days[day]))
+        return keys
+
+
+class PhoneIndex:
+    min_suffix = 4
+    max_suffix = 7
+
+    def __init__(self):
+        self.owners = {}  # normalized phone -> keys, older files may share a number
+        self.suffixes = defaultdict(set)  # last digits -> normalized phones
+
+    def owner(self, phone: str):
+        keys = self.owners.get(phone)
+        return min(keys) if keys else None
+
+    def owners_of(self, phone: str) -> list:
+        return sorted(self.owners.get(phone, ()))
+
+    def add(self, key, phone: str) -> None:
+        if phone not in self.owners:
+            self.owners[phone] = set()
+            for size in range(self.min_suffix, self.max_suffix + 1):
+                self.suffixes[phone[-size:]].add(phone)
+        self.owners[phone].add(key)
+
+    def discard(self, key, phone: str) -> None:
+        keys = self.owners.get(phone)
+        if keys is None or key not in keys:
+            return
+        keys.discard(key)
+        if keys:  # still saved for another contact
+            return
+        del self.owners[phone]
+        for size in range(self.min_suffix, self.max_suffix + 1):
+            phones = self.suffixes.get(phone[-size:])
+            if phones is None:
+                continue
+            phones.discard(phone)
+            if not phones:
+                del self.suffixes[phone[-size:]]
+
+    def lookup(self, digits: str) -> list:
+        # phones ending with digits, at least min_suffix digits long
+        if len(digits) < self.min_suffix:
+            return []
+        phones = self.suffixes.get(digits[-self.max_suffix :], ())
+        return sorted(phone for phone in phones if phone.endswith(digits))
+
+
+def levenshtein(pattern: str):
+    # bit-parallel edit distance to pattern (Myers, Hyyrö), one pass over the other word
+    size = len(pattern)
+    masks = {}
+    for i, char in enumerate(pattern):
+        masks[char] = masks.get(char, 0) | 1 << i
+    full = (1 << size) - 1
+    last = 1 << (size - 1) if size else 0
+
+    def distance(text: str) -> int:
+        if not size:
+            return len(text)
+        plus, minus, score = full, 0, size
+        for char in text:
+            eq = masks.get(char, 0)
+            xv = eq | minus
+            xh = (((eq & plus) + plus) ^ plus) | eq
+            hp = minus | ~(xh | plus)
+            hm = plus & xh
+            if hp & last:
+                score += 1
+            elif hm & last:
+                score -= 1
+            hp = hp << 1 | 1
+            hm <<= 1
+            plus = (hm | ~(xv | hp)) & full
+            minus = hp & xv
+        return score
+
+    return distance
+
+
+class BKTree:
+    # words at edit distance d from a node live under children[node][d]
+    def __init__(self):
+        self.root = None
+        self.children = {}
+
+    def add(self, word: str) -> None:
+        if self.root is None:
+            self.root = word
+            self.children[word] = {}
+            return
+        distance = levenshtein(word)
+        node = self.root
+        while True:
+            dist = distance(node)
+            if dist == 0:
+                return
+            edges = self.children[node]
+            child = edges.get(dist)
+            if child is None:
+                edges[dist] = word
+                self.children[word] = {}
+                return
+            node = child
+
+    def search(self, word: str, limit: int) -> list:
+        # (distance, word) pairs within limit edits of word
+        if self.root is None:
+            return []
+        distance = levenshtein(word)
+        children = self.children
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            dist = distance(node)
+            if dist <= limit:
+                found.append((dist, node))
+            for edge, child in children[node].items():
+                if dist - limit <= edge <= dist + limit:
+                    stack.append(child)
+        return found
+
+
+class NameIndex:
+    # words of the contact names: a BK-tree for typos and a phonetic key
+    # shared by Latin and Cyrillic spellings of the same name
+    TRANSLIT = str.maketrans(
+        {
+            "а": "a", "б": "b", "в": "v", "г": "g", "ґ": "g", "д": "d", "е": "e", "є": "ye",
+            "ё": "yo", "ж": "zh", "з": "z", "и": "y", "і": "i", "ї": "yi", "й": "y", "к": "k",
+            "л": "l", "м": "m", "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t",
+            "у": "u", "ф": "f", "х": "kh", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "shch", "ь": "",
+            "ъ": "", "ы": "y", "э": "e", "ю": "yu", "я": "ya", "'": "", "’": "",
+        }
+    )
+    CODES = {
+        **dict.fromkeys("bfpvw", "1"),
+        **dict.fromkeys("cgjkqsxzh", "2"),
+        **dict.fromkeys("dt", "3"),
+        "l": "4",
+        **dict.fromkeys("mn", "5"),
+        "r": "6",
+    }
+
+    def __init__(self):
+        self.bktree = None  # built on the first lookup, loading stays cheap
+        self.prefixes = None  # trie of the full names, built on the first completion
+        self.words = defaultdict(set)  # word -> keys, a word stays in the tree once added
+        self.sounds = defaultdict(set)  # phonetic key -> words
+
+    @staticmethod
+    def split(name: str) -> list:
+        return name.casefold().split()
+
+    @classmethod
+    def phonetic(cls, word: str) -> str:
+        # consonant classes in the order they are heard, vowels and repeats dropped
+        latin = word.translate(cls.TRANSLIT)
+        if latin[:1] == "h":
+            latin = latin[1:]  # Hanna and Anna
+        key = []
+        for char in latin:
+            code = cls.CODES.get(char)
+            if code is not None and (not key or key[-1] != code):
+                key.append(code)
+        return "".join(key) or latin
+
+    @property
+    def tree(self) -> BKTree:
+        if self.bktree is None:
+            self.bktree = BKTree()
+            for word in self.words:
+                self.bktree.add(word)
+        return self.bktree
+
+    def complete(self, prefix: str, limit: int = None) -> list:
+        if self.prefixes is None:
+            self.prefixes = PrefixTrie({key for keys in self.words.values() for key in keys})
+        return self.prefixes.complete(prefix, limit)
+
+    def add(self, key) -> None:
+        if self.prefixes is not None:
+            self.prefixes.add(key)
+        for word in self.split(key):
+            if word not in self.words:
+                if self.bktree is not None:
+                    self.bktree.add(word)
+                self.sounds[self.phonetic(word)].add(word)
+            self.words[word].add(key)
+
+    def discard(self, key) -> None:
+        if self.prefixes is not None:
+            self.prefixes.discard(key)
+        for word in self.split(key):
+            keys = self.words.get(word)
+            if keys is not None:
+                keys.discard(key)
+
+    @staticmethod
+    def tolerance(word: str) -> int:
+        return 1 if len(word) <= 4 else 2
+
+    def matches(self, query: str) -> dict:
+        # word -> edits; the search widens from one edit to the tolerance and then to
+        # words that only sound the same, which cost one edit more than the tolerance
+        tolerance = self.tolerance(query)
+        for limit in range(1, tolerance + 1):
+            words = {word: dist for dist, word in self.tree.search(query, limit) if self.words[word]}
+            if words:
+                return words
+        sounds = self.sounds.get(self.phonetic(query), ())
+        return {word: tolerance + 1 for word in sounds if self.words[word]}
+
+    def closest(self, text: str, limit: int = 10) -> list:
+        # keys ranked by the edits summed over the words of text
+        queries = [self.matches(query) for query in self.split(text)]
+        if not queries or not all(queries):
+            return []
+        # the query word with the fewest contacts drives, the others only rescore them
+        queries.sort(key=lambda words: sum(len(self.words[word]) for word in words))
+        driver, others = queries[0], queries[1:]
+        scores = {}
+        last = 0
+        for word, dist in sorted(driver.items(), key=lambda item: item[1]):
+            if not others and dist > last and len(scores) >= limit:
+                break  # a single word query only needs the closest words
+            last = dist
+            for key in self.words[word]:
+                if dist < scores.get(key, dist + 1):
+                    scores[key] = dist
+        for words in others:
+            rescored = {}
+            for key, score in scores.items():
+                dist = min((words[word] for word in self.split(key) if word in words), default=None)
+                if dist is not None:
+                    rescored[key] = score + dist
+            scores = rescored
+        return [key for _, key in heapq.nsmallest(limit, ((dist, key) for key, dist in scores.items()))]
+
+
+class PrefixTrie:
+    # character trie of strings; a branch that holds a single string keeps the
+    # string itself instead of a chain of nodes, "" marks a string ending at a node
+    def __init__(self, keys=()):
+        self.root = {}
+        self.size = 0
+        for key in keys:
+            self.add(key)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, key: str) -> None:
+        node = self.root
+        i = 0
+        while True:
+            if i == len(key):
+                if "" not in node:
+                    node[""] = key
+                    self.size += 1
+                return
+            child = node.get(key[i])
+            if child is None:
+                node[key[i]] = key
+                self.size += 1
+                return
+            if isinstance(child, str):
+                if child == key:
+                    return
+                # both strings share key[: i + 1], push the stored one a level down
+                branch = {"" if len(child) == i + 1 else child[i + 1]: child}
+                node[key[i]] = branch
+                child = branch
+            node = child
+            i += 1
+
+    def discard(self, key: str) -> None:
+        path = []
+        node = self.root
+        for char in key:
+            child = node.get(char)
+            if child is None:
+                return
+            if isinstance(child, str):
+                if child != key:
+                    return
+                del node[char]
+                break
+            path.append((node, char))
+            node = child
+        else:
+            if node.get("") != key:
+                return
+            del node[""]
+        self.size -= 1
+        # a node left with a single string collapses into its parent
+        while path:
+            parent, char = path.pop()
+            if not node:
+                del parent[char]
+            elif len(node) == 1 and isinstance(next(iter(node.values())), str):
+                parent[char] = next(iter(node.values()))
+            else:
+                break
+            node = parent
+
+    def longest_prefix(self, text: str, separator: str = " "):
+        # the longest string that text starts with, followed by separator or the end of text
+        best = None
+        node = self.root
+        for i, char in enumerate(text):
+            if "" in node and text[i] == separator:
+                best = node[""]
+            child = node.get(char)
+            if child is None:
+                return best
+            if isinstance(child, str):
+                end = len(child)
+                if text.startswith(child) and (end == len(text) or text[end] == separator):
+                    return child
+                return best
+            node = child
+        return node.get("", best)
+
+    def complete(self, prefix: str, limit: int = None) -> list:
+        # strings starting with prefix in sorted order, at most limit of them
+        node = self.root
+        for char in prefix:
+            child = node.get(char)
+            if child is None:
+                return []
+            if isinstance(child, str):
+                return [child] if child.startswith(prefix) else []
+            node = child
+        found = []
+        stack = [node]
+        while stack and (limit is None or len(found) < limit):
+            item = stack.pop()
+            if isinstance(item, str):
+                found.append(item)
+            else:
+                stack.extend(item[char] for char in sorted(item, reverse=True))
+        return found
+
+
+class ValueIndex:
+    # value -> keys for equality lookups, a key may have several values
+    def __init__(self):
+        self.values = defaultdict(set)
+
+    def add(self, key, values) -> None:
+        for value in values:
+            self.values[value].add(key)
+
+    def discard(self, key, values) -> None:
+        for value in values:
+            keys = self.values.get(value)
+            if keys is None:
+                continue
+            keys.discard(key)
+            if not keys:
+                del self.values[value]
+
+    def lookup(self, value) -> set:
+        return self.values.get(value, set())
+
+    def count(self, value) -> int:
+        return len(self.values.get(value, ()))
+
+
+class FieldIndexes:
+    # secondary indexes for the query command: e-mail domain, number of phones,
+    # birthday month and address words, None stands for a missing value
+    FIELDS = ("email", "phones", "month", "address")
+    WORD = re.compile(r"\w+")
+
+    def __init__(self):
+        self.indexes = {field: ValueIndex() for field in self.FIELDS}
+
+    @classmethod
+    def values(cls, birthday, phones, email, address) -> dict:
+        return {
+            "email": (email.rpartition("@")[2].casefold() if email else None,),
+            "phones": (len(phones),),
+            "month": (birthday.month if birthday else None,),
+            "address": set(cls.WORD.findall(address.casefold())) if address else (None,),
+        }
+
+    def add(self, key, birthday, phones, email, address) -> None:
+        for field, values in self.values(birthday, phones, email, address).items():
+            self.indexes[field].add(key, values)
+
+    def discard(self, key, birthday, phones, email, address) -> None:
+        for field, values in self.values(birthday, phones, email, address).items():
+            self.indexes[field].discard(key, values)
+
+    def lookup(self, field, value) -> set:
+        return self.indexes[field].lookup(value)
+
+    def count(self, field, value) -> int:
+        return self.indexes[field].count(value)
+
+
+class TextIndex:
+    # inverted index with term positions, ranks with BM25 and answers "phrase" queries
+    k1 = 1.2
+    b = 0.75
+    prefix_weight = 0.5
+    APOSTROPHES = str.maketrans({"’": "'", "ʼ": "'", "‘": "'", "`": "'", "′": "'"})
+    WORD = re.compile(r"\w+(?:'\w+)*")
+    PHRASE = re.compile(r'"([^"]*)"?')
+
+    def __init__(self):
+        self.postings = {}  # term -> {key: positions}
+        self.lengths = {}  # key -> number of terms
+        self.total = 0
+        self.vocabulary = []  # sorted terms, for the unfinished last word of a query
+
+    @classmethod
+    def tokens(cls, text: str) -> list:
+        return cls.WORD.findall(text.casefold().translate(cls.APOSTROPHES))
+
+    def add(self, key, text: str) -> None:
+        tokens = self.tokens(text)
+        self.lengths[key] = len(tokens)
+        self.total += len(tokens)
+        for pos, term in enumerate(tokens):
+            docs = self.postings.get(term)
+            if docs is None:
+                docs = self.postings[term] = {}
+                insort(self.vocabulary, term)
+            docs.setdefault(key, []).append(pos)
+
+    def discard(self, key, text: str) -> None:
+        # text is the one the key was added with
+        if key not in self.lengths:
+            return
+        self.total -= self.lengths.pop(key)
+        for term in set(self.tokens(text)):
+            docs = self.postings.get(term)
+            if docs is None:
+                continue
+            docs.pop(key, None)
+            if not docs:
+                del self.postings[term]
+                del self.vocabulary[bisect_left(self.vocabulary, term)]
+
+    def expand(self, prefix: str) -> list:
+        terms = []
+        for i in range(bisect_left(self.vocabulary, prefix), len(self.vocabulary)):
+            if not self.vocabulary[i].startswith(prefix):
+                break
+            terms.append(self.vocabulary[i])
+        return terms
+
+    def idf(self, df: int) -> float:
+        return math.log(1 + (len(self.lengths) - df + 0.5) / (df + 0.5))
+
+    def has_phrase(self, key, terms: list) -> bool:
+        first, *rest = [self.postings[term][key] for term in terms]
+        rest = [set(positions) for positions in rest]
+        return any(all(pos + i in positions for i, positions in enumerate(rest, 1)) for pos in first)
+
+    def search(self, query: str):
+        # keys of the documents with every word and phrase of query, best BM25 score first;
+        # the last word may be unfinished and matches as a prefix. None when query has no words
+        phrases = [self.tokens(phrase) for phrase in self.PHRASE.findall(query)]
+        phrases = [terms for terms in phrases if terms]
+        rest = self.PHRASE.sub(" ", query)
+        words = self.tokens(rest)
+        if not words and not phrases:
+            return None
+        groups = [(term, [term]) for terms in phrases for term in terms]
+        for i, word in enumerate(words):
+            if i == len(words) - 1 and rest[-1:].isalnum():
+                groups.append((None, self.expand(word)))  # unfinished word
+            else:
+                groups.append((word, [word]))
+        postings = []
+        for exact, terms in groups:
+            docs = set().union(*(self.postings.get(term, ()) for term in terms))
+            if not docs:
+                return []
+            postings.append((docs, exact, terms))
+        keys = set.intersection(*(docs for docs, _, _ in postings))
+        if phrases:
+            keys = {key for key in keys if all(self.has_phrase(key, terms) for terms in phrases)}
+        scale = self.k1 * self.b * len(self.lengths) / self.total
+        norms = {key: self.k1 * (1 - self.b) + scale * self.lengths[key] for key in keys}
+        scores = dict.fromkeys(keys, 0.0)
+        for docs, exact, terms in postings:
+            if exact is None:
+                exact = words[-1]
+                prefix = True
+            else:
+                prefix = False
+            found = self.postings.get(exact, {})
+            if found:
+                weight = self.idf(len(found)) * (self.k1 + 1)
+                pairs = [(key, found[key]) for key in scores if key in found] if len(found) > len(scores) else found.items()
+                for key, positions in pairs:
+                    if key in scores:
+                        tf = len(positions)
+                        scores[key] += weight * tf / (tf + norms[key])
+            if prefix:
+                # other words that start with the unfinished one count once, as a weaker match
+                weight = self.idf(len(docs)) * (self.k1 + 1) * self.prefix_weight
+                for key in scores if len(scores) < len(docs) else docs:
+                    if key in docs and key in scores and key not in found:
+                        scores[key] += weight / (1 + norms[key])
+        return sorted(scores, key=lambda key: -scores[key])
+
+
+class RankedList:
+    # items ordered by rank, highest first, and by insertion within a rank;
+    # ranks take few values (tag counts), so each one keeps a bucket
+    def __init__(self, rank, items=()):
+        self.rank = rank
+        self.buckets = {}  # rank -> {id(item): item} in insertion order
+        self.ranks = []  # ranks of the buckets in ascending order
+        self.placed = {}  # id(item) -> rank it was filed under
+        for item in items:
+            self.append(item)
+
+    def append(self, item) -> None:
+        # placed after the items of the same rank
+        if id(item) in self.placed:
+            return
+        rank = self.placed[id(item)] = self.rank(item)
+        bucket = self.buckets.get(rank)
+        if bucket is None:
+            bucket = self.buckets[rank] = {}
+            insort(self.ranks, rank)
+        bucket[id(item)] = item
+
+    def remove(self, item) -> None:
+        rank = self.placed.pop(id(item))
+        bucket = self.buckets[rank]
+        del bucket[id(item)]
+        if not bucket:
+            del self.buckets[rank]
+            del self.ranks[bisect_left(self.ranks, rank)]
+
+    def move(self, item) -> None:
+        # refiles item after its rank changed
+        self.remove(item)
+        self.append(item)
+
+    def __len__(self) -> int:
+        return len(self.placed)
+
+    def __contains__(self, item) -> bool:
+        rank = self.placed.get(id(item))
+        return rank is not None and self.buckets[rank].get(id(item)) is item
+
+    def __iter__(self):
+        for rank in reversed(self.ranks):
+            yield from self.buckets[rank].values()
+
+    def _from(self, start: int):
+        # whole buckets before start are skipped without walking them
+        for rank in reversed(self.ranks):
+            bucket = self.buckets[rank]
+            if start >= len(bucket):
+                start -= len(bucket)
+                continue
+            items = iter(bucket.values())
+            for _ in range(start):
+                next(items)
+            start = 0
+            yield from items
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step < 0:
+                return list(self)[index]
+            if start >= stop:
+                return []
+            items = self._from(start)
+            return [next(items) for _ in range(stop - start)][::step]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("RankedList index out of range")
+        return next(self._from(index))
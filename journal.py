@@ -0,0 +1,164 @@
+"""append-only journal of changes on top of the JSON snapshot files"""
+from contextlib import nullcontext
+import json
+import os
+from threading import Event, Lock, Thread
+
+
+class Journal:
+    def __init__(self, snapshot: str, fold_entries, limit: int = 1048576):
+        self.snapshot = snapshot
+        self.path = snapshot + ".journal"
+        self.old_path = self.path + ".old"  # journal being folded into the snapshot
+        self.fold_entries = fold_entries  # (saved data or None, entries) -> data of the new snapshot
+        self.limit = limit
+        self.lock = Lock()
+        self.order = Lock()  # entries are taken and written in one go, so they reach the file in order
+        self.pending = []  # entries of a failed write
+        self.worker = None
+        self.file = open(self.path, "ab", buffering=0)  # nothing is left in a buffer when a write fails
+
+    @staticmethod
+    def read(path):
+        if not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as log:
+            for line in log:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:  # torn write of the last entry
+                    break
+                yield entry
+
+    def load(self, store) -> None:
+        if os.path.exists(self.snapshot):
+            store.load_from_file(self.snapshot)
+        for path in (self.old_path, self.path):
+            for entry in self.read(path):
+                store.apply_journal(entry)
+        store.journal_entries()  # replayed entries are already on disk
+        if os.path.exists(self.old_path) or self.file.tell() > self.limit:
+            self.compact()
+
+    def commit(self, store, data_lock=None) -> None:
+        # data_lock, then order, on every path: a command that commits while it runs (import
+        # contacts) already holds data_lock; the store is locked only while the entries are taken
+        with data_lock or nullcontext():
+            self.order.acquire()
+            entries = self.pending + store.journal_entries()
+        try:
+            if not entries:
+                return
+            data = "".join(
+                json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n" for entry in entries
+            ).encode("utf-8")
+            try:
+                with self.lock:
+                    self.write(data)
+            except Exception:
+                self.pending = entries  # written first by the next commit
+                raise
+            self.pending = []
+            store.journal_written()
+        finally:
+            self.order.release()
+        if self.file.tell() > self.limit:
+            self.compact()
+
+    def write(self, data: bytes) -> None:
+        start = self.file.tell()
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[self.file.write(view) :]
+            os.fsync(self.file.fileno())
+        except OSError:
+            try:
+                self.file.truncate(start)  # no half commit in front of the retry
+            except OSError:
+                pass
+            raise
+
+    def compact(self) -> None:
+        if self.worker is not None and self.worker.is_alive():
+            return
+        with self.lock:
+            if not os.path.exists(self.old_path):
+                self.file.close()
+                os.replace(self.path, self.old_path)
+                self.file = open(self.path, "ab", buffering=0)
+        self.worker = Thread(target=self.fold, daemon=True)
+        self.worker.start()
+
+    def fold(self) -> None:
+        # on the saved JSON, a store with its indexes is never built in the background
+        saved = None
+        if os.path.exists(self.snapshot):
+            with open(self.snapshot, "r") as db:
+                saved = json.load(db)
+        data = self.fold_entries(saved, self.read(self.old_path))
+        temp = self.snapshot + ".tmp"
+        with open(temp, "w") as db:
+            json.dump(data, db)
+            db.flush()
+            os.fsync(db.fileno())
+        os.replace(temp, self.snapshot)
+        os.remove(self.old_path)
+
+    def close(self) -> None:
+        if self.worker is not None:
+            self.worker.join()
+        self.file.close()
+
+
+class Autosave(Thread):
+    # commits the journals from a background thread, so the input loop never waits for the disk
+    def __init__(self, targets, data_lock, interval: float = 1.0, changes: int = 50):
+        super().__init__(daemon=True)
+        self.targets = targets  # (Journal, store) pairs
+        self.data_lock = data_lock  # held while a command changes the stores
+        self.interval = interval
+        self.changes = changes
+        self.saved = [store.generation for _, store in targets]
+        self.wake = Event()
+        self.stopping = False
+        self.error = None  # last failed checkpoint, the thread goes on and tries again
+
+    def pending(self) -> int:
+        return sum(store.generation - saved for (_, store), saved in zip(self.targets, self.saved))
+
+    def touch(self) -> None:
+        # called after a command, enough changes start a checkpoint before the interval is over
+        if self.pending() >= self.changes:
+            self.wake.set()
+
+    def checkpoint(self) -> None:
+        for i, (journal, store) in enumerate(self.targets):
+            generation = store.generation
+            if generation == self.saved[i]:  # clean, nothing to write
+                continue
+            try:
+                journal.commit(store, self.data_lock)
+            except Exception as err:  # a dead thread would leave every change to exit
+                self.error = err
+                continue
+            self.saved[i] = generation
+
+    def take_error(self):
+        error, self.error = self.error, None
+        return error
+
+    def run(self) -> None:
+        while True:
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            stopping = self.stopping
+            self.checkpoint()
+            if stopping:
+                break
+
+    def stop(self) -> None:
+        # the last changes are written before it returns
+        self.stopping = True
+        self.wake.set()
+        self.join()
@@ -10,10 +10,22 @@ from ab_classes import (
     AddressBook,
     NotePad,
 )
-from functools import wraps
+from collections import deque
+from collections.abc import Iterator
+from contextlib import redirect_stdout
+from functools import partial, wraps
+from threading import Lock
+import argparse
+import asyncio
+import io
 import json
 import os
-from pathlib import Path
+import sys
+from indexes import PrefixTrie
+from journal import Autosave, Journal
+from query import Query
+from storage import SqliteAddressBook, SqliteArchive, SqliteNotePad, SqliteStorage
+from archive import NoteArchive
 from notebook import (
     WITH_NOTES,
     add_note,
@@ -23,8 +35,14 @@ from notebook import (
     show_notes,
     search_note,
     del_note,
+    show_tags,
+    show_archive,
+    search_archive,
+    restore_note,
 )
+import bulk
 import re
+import server
 import sort_folder
 
 
@@ -38,21 +56,29 @@ def input_error(func):
         except TypeError as err:
             if func.__name__ == "add_birthday":
                 if languages:
-                    return "enter name and birthday"
+                    return TypeError("enter name and birthday")
                 else:
-                    return "введіть ім'я та день народження"
+                    return TypeError("введіть ім'я та день народження")
             if func.__name__ == "add_email":
                 if languages:
-                    return "enter name and e-mail"
+                    return TypeError("enter name and e-mail")
                 else:
-                    return "введіть ім'я та e-mail"
+                    return TypeError("введіть ім'я та e-mail")
             return err
 
         except AttributeError:
             if languages:
-                return "Check the correctness of data inputs and if contact was created"
+                message = "Check the correctness of data inputs and if contact was created"
             else:
-                return "Перевірте правильність вводу даних та чи створений контакт"
+                message = "Перевірте правильність вводу даних та чи створений контакт"
+            if len(args) > 1 and isinstance(args[0], AddressBook) and isinstance(args[1], str):
+                if args[1] not in args[0]:
+                    names = ", ".join(rec.name.value for rec in args[0].find(args[1], 3))
+                    if names and languages:
+                        message += f". Did you mean: {names}?"
+                    elif names:
+                        message += f". Можливо, ви мали на увазі: {names}?"
+            return AttributeError(message)  # errors are returned as exceptions, batch mode counts them
 
         except ValueError as err:
             return err
@@ -60,6 +86,9 @@ def input_error(func):
         except IndexError as err:
             return err
 
+        except OSError as err:
+            return err
+
     return wrapper
 
 
@@ -160,26 +189,22 @@ def congrat(book: AddressBook, days: int):
             raise ValueError("Enter number of days")
         else:
             raise ValueError("Введіть число днів")
-    output = ""
-    for contact in book.values():
-        if contact.days_to_birthday() <= int(days):
-            output += str(contact)
-    if languages:
-        text = (
-            f"the following contacts haave birthdays:\n{output}"
-            if output
-            else "none of the contacts has a birthday"
-        )
-    else:
-        text = (
-            f"день народження в наступних контактів:\n{output}"
-            if output
-            else "ні в кого з контактів не має дня народження"
-        )
-    if languages:
-        return f"During the next {days} days {text}"
-    else:
-        return f"В період наступних {days} днів {text}"
+    contacts = book.birthdays_within(int(days))
+    if not contacts:
+        if languages:
+            return f"During the next {days} days none of the contacts has a birthday"
+        else:
+            return f"В період наступних {days} днів ні в кого з контактів не має дня народження"
+
+    def lines():
+        if languages:
+            yield f"During the next {days} days the following contacts haave birthdays:\n"
+        else:
+            yield f"В період наступних {days} днів день народження в наступних контактів:\n"
+        for contact in contacts:
+            yield str(contact)
+
+    return lines()
 
 
 @input_error
@@ -250,9 +275,9 @@ def change_email(
 ):
     if contact not in book:
         if languages:
-            return f'The contact "{contact}" is not in the address book'
+            raise ValueError(f'The contact "{contact}" is not in the address book')
         else:
-            return f'Контакт "{contact}" відсутній в адресній книзі'
+            raise ValueError(f'Контакт "{contact}" відсутній в адресній книзі')
 
     rec = book.get(contact)
 
@@ -345,7 +370,7 @@ def del_phone(book: AddressBook, contact: str, phone=None):
 def del_email(book: AddressBook, *args):
     contact = " ".join(args)
     rec = book.get(contact)
-    rec.email = None
+    rec.del_email()
     if languages:
         return f"Contact {contact}, e-mail deleted"
     else:
@@ -378,7 +403,7 @@ def del_contact(book: AddressBook, *args):
 def del_birthday(book: AddressBook, *args):
     contact = " ".join(args)
     rec = book.get(contact)
-    rec.birthday = None
+    rec.del_birthday()
     if languages:
         return f"Contact {contact}, birthday deleted"
     else:
@@ -389,28 +414,57 @@ def del_birthday(book: AddressBook, *args):
 def del_address(book: AddressBook, *args):
     contact = " ".join(args)
     rec = book.get(contact)
-    rec.address = None
+    rec.del_address()
     if languages:
         return f"Contact {contact}, address deleted"
     else:
         return f"Контакт {contact}, адреса видалена"
 
 
-def load_data(book1: AddressBook, notebook: NotePad):
-    global db_file_name, note_file_name, PAGE, languages
+def load_data():
+    global db_file_name, note_file_name, PAGE, languages, book_storage, note_storage, server_address
+    global autosave_interval, autosave_changes
     with open(os.path.join(dir_path, "config.JSON")) as cfg:
         cfg_data = json.load(cfg)
         db_file_name = os.path.join(dir_path, cfg_data["PhoneBookFile"])
         note_file_name = os.path.join(dir_path, cfg_data["NoteBookFile"])
         PAGE = cfg_data["Page"]
         languages = True if cfg_data["Language"] == "eng" else False
-
-
-    if Path(db_file_name).exists():
-        book1.load_from_file(db_file_name)
-    if Path(note_file_name).exists():
-        notebook.load_from_file(note_file_name)
-    pass
+        journal_limit = cfg_data.get("JournalLimit", 1048576)
+        storage = cfg_data.get("Storage", "json")
+        lazy = cfg_data.get("LazyLoad", True)
+        sqlite_file = os.path.join(dir_path, cfg_data.get("SQLiteFile", "memomind.db"))
+        archive_file = os.path.join(dir_path, cfg_data.get("ArchiveFile", "note_archive.JSON"))
+        archive_days = cfg_data.get("ArchiveAfterDays", 30)
+        server_address = cfg_data.get("Server", "127.0.0.1:7878")
+        autosave_interval = cfg_data.get("AutosaveInterval", 1.0)
+        autosave_changes = cfg_data.get("AutosaveChanges", 50)
+
+    if storage == "sqlite":
+        book_storage = note_storage = SqliteStorage(sqlite_file)
+        book1 = SqliteAddressBook(book_storage)
+        notebook = SqliteNotePad(note_storage)
+        notebook.archive = SqliteArchive(note_storage)
+        if book_storage.is_new:  # one pass migration of the JSON files
+            for file_name, store, fold in (
+                (db_file_name, book1, AddressBook.fold_journal),
+                (note_file_name, notebook, NotePad.fold_journal),
+            ):
+                journal = Journal(file_name, fold, journal_limit)
+                journal.load(store)
+                journal.close()
+            book_storage.commit()
+    else:
+        book1 = AddressBook(lazy=lazy)
+        notebook = NotePad()
+        book_storage = Journal(db_file_name, AddressBook.fold_journal, journal_limit)
+        note_storage = Journal(note_file_name, NotePad.fold_journal, journal_limit)
+        book_storage.load(book1)
+        note_storage.load(notebook)
+        notebook.archive = NoteArchive(archive_file)
+    if notebook.archive_done(archive_days):
+        note_storage.commit(notebook)
+    return book1, notebook
 
 
 @input_error
@@ -423,23 +477,74 @@ def phone(book: AddressBook, *args):
         return f'Контакт "{contact}". {rec.show_phones()}'
 
 
+@input_error
+def caller(book: AddressBook, *args):
+    number = "".join(args)
+    result = book.find_phone(number)
+    if not result:
+        if languages:
+            return "not found"
+        else:
+            return "не знайдено"
+    return "\n".join(f"{phone}: {rec.name}" for phone, rec in result)
+
+
+def cache_stats(*args):
+    hits, misses, rate = Record.render_stats()
+    if languages:
+        return f"Rendering cache: {hits} hits, {misses} misses, hit rate {rate:.1f}%"
+    else:
+        return f"Кеш відображення: {hits} влучань, {misses} промахів, частка влучань {rate:.1f}%"
+
+
 def save_data(book: AddressBook, notebook: NotePad):
-    book.save_to_file(db_file_name)
-    notebook.save_to_file(note_file_name)
+    book_storage.commit(book)
+    note_storage.commit(notebook)
+
+
+def start_autosave(book: AddressBook, notebook: NotePad, data_lock: Lock):
+    # JSON journals only, a sqlite3 connection stays in the thread that opened it
+    if not isinstance(book_storage, Journal):
+        return None
+    saver = Autosave(
+        [(book_storage, book), (note_storage, notebook)], data_lock, autosave_interval, autosave_changes
+    )
+    saver.start()
+    return saver
+
+
+def autosave_touch(saver: Autosave) -> None:
+    saver.touch()
+    err = saver.take_error()
+    if err is not None:
+        if languages:
+            Console.user_output(f"Changes were not saved, trying again: {failure(err)}")
+        else:
+            Console.user_output(f"Зміни не збережено, повторна спроба: {failure(err)}")
+
+
+def locked(data_lock: Lock, func):
+    @wraps(func)
+    def inner(*args, **kwargs):
+        with data_lock:
+            return func(*args, **kwargs)
+
+    return inner
 
 
 def show_all(book: AddressBook, *args):
-    if len(book) <= PAGE:
-        return book.show_all()
+    by_name = "name" in (arg.lower() for arg in args)
+    if len(book) <= PAGE or Console.answers is not None:  # no pages in batch mode
+        return book.show_all(by_name)
     else:
-        gen_obj = book.iterator(PAGE)
-        for i in gen_obj:
+        for records in book.iterator(PAGE, by_name):
+            page = (str(record) for record in records)
             if languages:
-                Console.user_output(i)
+                Console.user_output(page)
                 Console.user_output("*" * 50)
                 Console.user_input("Press any key")
             else:
-                Console.user_output(i)
+                Console.user_output(page)
                 Console.user_output("*" * 50)
                 Console.user_input("Нажміть будь-яку клавішу")
         x = book.lening()
@@ -449,33 +554,103 @@ def show_all(book: AddressBook, *args):
             return f"Всього: {x} контактів."
 
 
+@input_error
+def find(book: AddressBook, *args):
+    name = " ".join(args)
+    if not name:
+        if languages:
+            raise ValueError("enter the name to find")
+        else:
+            raise ValueError("введіть ім'я для пошуку")
+    result = book.find(name, PAGE)
+    if not result:
+        if languages:
+            return "not found"
+        else:
+            return "не знайдено"
+
+    def lines():
+        if languages:
+            yield f"Closest contacts to {name}:\n"
+        else:
+            yield f"Найближчі контакти до {name}:\n"
+        for i, rec in enumerate(result, start=1):
+            yield f"{i}. {rec}"
+
+    return lines()
+
+
+@input_error
+def query(book: AddressBook, *args):
+    result = Query(book, " ".join(args)).run()
+    if not result:
+        if languages:
+            return "not found"
+        else:
+            return "не знайдено"
+
+    def lines():
+        if languages:
+            yield f"Found {len(result)} contacts:\n"
+        else:
+            yield f"Знайдено {len(result)} контактів:\n"
+        for rec in result:
+            yield str(rec)
+
+    return lines()
+
+
 @input_error
 def search(book: AddressBook, *args):
     pattern = " ".join(args)
     if len(pattern) < 3:
         if languages:
-            return "search string length >= 3"
+            raise ValueError("search string length >= 3")
         else:
-            return "довжина рядка для пошуку >= 3"
+            raise ValueError("довжина рядка для пошуку >= 3")
     result = book.search(pattern)
     if not result:
         if languages:
             return "not found"
         else:
             return "не знайдено"
-    matches = ""
-    for i in result:
-        matches += str(i)
-    frags = matches.split(pattern)
-    highlighted = ""
-    for i, fragment in enumerate(frags):
-        highlighted += fragment
-        if i < len(frags) - 1:
-            highlighted += "\033[42m" + pattern + "\033[0m"
+    marked = "\033[42m" + pattern + "\033[0m"
+
+    def lines():
+        if languages:
+            yield f"Found {len(result)} matches:\n"
+        else:
+            yield f"Знайдено {len(result)} збігів:\n"
+        for rec in result:
+            yield str(rec).replace(pattern, marked)
+
+    return lines()
+
+
+@input_error
+def import_contacts(book: AddressBook, *args):
+    path = " ".join(args)
+    reject_path = path + ".rejected.csv"
+    imported, rejected = bulk.import_contacts(book, path, reject_path, lambda: book_storage.commit(book))
     if languages:
-        return f"Found {len(result)} matches:\n" + highlighted
+        output = f"Imported {imported} contacts."
+        if rejected:
+            output += f" {rejected} rows were rejected, see {reject_path}"
     else:
-        return f"Знайдено {len(result)} збігів:\n" + highlighted
+        output = f"Імпортовано {imported} контактів."
+        if rejected:
+            output += f" {rejected} рядків відхилено, див. {reject_path}"
+    return output
+
+
+@input_error
+def export_contacts(book: AddressBook, *args):
+    path = " ".join(args)
+    count = bulk.export_contacts(book, path)
+    if languages:
+        return f"Exported {count} contacts to {path}"
+    else:
+        return f"Експортовано {count} контактів до {path}"
 
 
 @input_error
@@ -499,6 +674,8 @@ def exit(book: AddressBook, notebook: NotePad, *args):
     global is_ended
     is_ended = True
     save_data(book, notebook)
+    book_storage.close()
+    note_storage.close()
     if languages:
         return "Good bye"
     else:
@@ -523,9 +700,9 @@ def language(book, *args):
     with open(os.path.join(dir_path, "config.JSON"), "r") as cfg:
         cfg_data = json.load(cfg)
     if languages:
-        x = input("Choose language: English or Ukrainian?(eng/ukr)>>> ")
+        x = Console.user_input("Choose language: English or Ukrainian?(eng/ukr)>>> ")
     else:
-        x = input("Виберіть мову: англійська або українська?(eng/ukr)>>> ")
+        x = Console.user_input("Виберіть мову: англійська або українська?(eng/ukr)>>> ")
     if "e" in x or "E" in x:
         with open(os.path.join(dir_path, "config.JSON"), "w") as cfg:
             cfg_data["Language"] = "eng"
@@ -562,16 +739,26 @@ COMMANDS = {
     "change email": change_email,
     "change phone": change,
     "phone": phone,
+    "caller": caller,
+    "cache stats": cache_stats,
     "show contacts": show_all,
     "show notes": show_notes,
+    "show tags": show_tags,
+    "show archive": show_archive,
     "search note": search_note,
+    "search archive": search_archive,
+    "restore note": restore_note,
     "search": search,
+    "find": find,
+    "query": query,
     "del note": del_note,
     "del address": del_address,
     "del phone": del_phone,
     "del bday": del_birthday,
     "del email": del_email,
     "del contact": del_contact,
+    "import contacts": import_contacts,
+    "export contacts": export_contacts,
     "sort folder": sort_targ_folder,
     "lang": language,
     "close": exit,
@@ -581,22 +768,196 @@ COMMANDS = {
 }
 
 
+COMMAND_TRIE = PrefixTrie(COMMANDS)
+
+# commands that do not change the book or the notebook, the server runs them side by side
+READ_COMMANDS = {
+    greet,
+    phone,
+    caller,
+    cache_stats,
+    congrat,
+    show_all,
+    show_notes,
+    show_tags,
+    show_archive,
+    search_note,
+    search_archive,
+    search,
+    find,
+    query,
+    help,
+    no_command,
+}
+
+
 def command_parser(line: str):
     line_prep = " ".join(line.split())
-    for k, v in COMMANDS.items():
-        if line_prep.lower().startswith(k + " ") or line_prep.lower() == k:
-            return v, re.sub(k, "", line_prep, flags=re.IGNORECASE).strip().rsplit(" ")
-    return no_command, []
+    command = COMMAND_TRIE.longest_prefix(line_prep.lower())
+    if command is None:
+        return no_command, []
+    return COMMANDS[command], line_prep[len(command) :].strip().split(" ")
+
+
+def completions(book: AddressBook, notebook: NotePad, line: str) -> list:
+    # a command first, then a contact name or the beginning of a note
+    command = COMMAND_TRIE.longest_prefix(line.lower())
+    if command is None or len(line) == len(command):
+        return COMMAND_TRIE.complete(line.lower(), PAGE)
+    text = line[len(command) :].lstrip()
+    head = line[: len(line) - len(text)]
+    if COMMANDS[command] in WITH_NOTES:
+        found = notebook.complete(text, PAGE)
+    else:
+        found = book.complete(text, PAGE)
+    return [head + item for item in found]
+
+
+def tab_completion(book: AddressBook, notebook: NotePad) -> None:
+    try:
+        import readline
+    except ImportError:  # no readline on Windows
+        return
+    matches = []
+
+    def complete(text, state):
+        if state == 0:
+            matches[:] = completions(book, notebook, text)
+        return matches[state] if state < len(matches) else None
+
+    readline.set_completer_delims("")  # names and notes contain spaces, complete the whole line
+    readline.set_completer(complete)
+    readline.parse_and_bind("tab: complete")
 
 
 is_ended = False
 languages = True  # True=En, False=Ukraine
 
 
+def failure(err: Exception) -> str:
+    if isinstance(err, EOFError):
+        if languages:
+            return f"no answer for the question: {err}"
+        else:
+            return f"немає відповіді на питання: {err}"
+    return f"{type(err).__name__}: {err}"
+
+
+def start_command(book: AddressBook, notebook: NotePad, line: str):
+    # (ok, printed text, result) of a line, answers to prompts follow the command after "|";
+    # a generator result is left to the caller to go through
+    text, *answers = line.split("|")
+    command, args = command_parser(text)
+    if command is no_command:
+        return False, "", no_command()
+    Console.answers = deque(answer.strip() for answer in answers)
+    printed = io.StringIO()  # questions and lists a command prints on its way
+    try:
+        with redirect_stdout(printed):
+            if command == exit:
+                result = command(book, notebook)
+            else:
+                result = command((notebook if command in WITH_NOTES else book), *args)
+    except Exception as err:
+        return False, printed.getvalue(), failure(err)
+    return not isinstance(result, Exception), printed.getvalue(), result
+
+
+def is_read(line: str) -> bool:
+    return command_parser(line.split("|")[0])[0] in READ_COMMANDS
+
+
+def is_exit(line: str) -> bool:
+    return command_parser(line.split("|")[0])[0] is exit
+
+
+def run_command(book: AddressBook, notebook: NotePad, line: str):
+    ok, printed, result = start_command(book, notebook, line)
+    if isinstance(result, Iterator):
+        try:
+            result = "".join(result)
+        except Exception as err:
+            ok, result = False, failure(err)
+    result = "" if result is None else str(result)
+    return ok, (printed + result).rstrip("\n")
+
+
+def run_batch(book: AddressBook, notebook: NotePad, lines, stop: bool = False) -> int:
+    # commands of a script with one commit at the end, returns the number of failed commands
+    done = failed = 0
+    output = sys.stdout
+    try:
+        for number, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            ok, text = run_command(book, notebook, line)
+            done += 1
+            failed += not ok
+            output.write(f"[{'ok' if ok else 'error'}] {number}: {line}\n")
+            if text:
+                output.write(text + "\n")
+            if is_ended or (stop and not ok):
+                break
+    finally:
+        Console.answers = None
+        if not is_ended:
+            save_data(book, notebook)
+            book_storage.close()
+            note_storage.close()
+    if languages:
+        output.write(f"Commands: {done}, failed: {failed}\n")
+    else:
+        output.write(f"Команд: {done}, з помилками: {failed}\n")
+    output.flush()
+    return failed
+
+
 def main():
-    book1 = AddressBook()
-    notebook = NotePad()
-    load_data(book1, notebook)
+    parser = argparse.ArgumentParser(description="MemoMind")
+    parser.add_argument("--batch", metavar="FILE", help='run the commands of FILE ("-" for stdin) and exit')
+    parser.add_argument("--stop", action="store_true", help="stop the batch at the first failed command")
+    parser.add_argument(
+        "--serve",
+        metavar="ADDRESS",
+        nargs="?",
+        const="",
+        help='serve the commands to clients on host:port or unix:/path ("Server" in config.JSON by default)',
+    )
+    options = parser.parse_args()
+    if options.serve is not None:
+        book1, notebook = load_data()
+        data_lock = Lock()
+        saver = start_autosave(book1, notebook, data_lock)
+        command_server = server.CommandServer(
+            locked(data_lock, partial(start_command, book1, notebook)),
+            is_read,
+            is_exit,
+            partial(autosave_touch, saver) if saver else partial(save_data, book1, notebook),
+            failure,
+        )
+        try:
+            asyncio.run(command_server.serve(options.serve or server_address))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if saver:
+                saver.stop()
+            save_data(book1, notebook)
+            book_storage.close()
+            note_storage.close()
+        return
+    if options.batch:
+        book1, notebook = load_data()
+        if options.batch == "-":
+            failed = run_batch(book1, notebook, sys.stdin, options.stop)
+        else:
+            with open(options.batch, encoding="utf-8") as script:
+                failed = run_batch(book1, notebook, script, options.stop)
+        sys.exit(1 if failed else 0)
+
+    book1, notebook = load_data()
+    tab_completion(book1, notebook)
     if languages:
         Console.user_output(
             "MemoMind \n",
@@ -608,23 +969,32 @@ def main():
             f"Доступні команди: {', '.join(k for k in COMMANDS.keys())}",
         )
 
-    while not is_ended:
-        s = Console.user_input(">>>")
-        command, args = command_parser(s)
-        if languages:
+    data_lock = Lock()
+    saver = start_autosave(book1, notebook, data_lock)
+    try:
+        while not is_ended:
+            s = Console.user_input(">>>")
+            command, args = command_parser(s)
             if command == exit:
+                if saver:
+                    saver.stop()
                 Console.user_output(command(book1, notebook), *args)
             else:
-                Console.user_output(
-                    command((notebook if command in WITH_NOTES else book1), *args)
-                )
-        else:
-            if command == exit:
-                Console.user_output(command(book1, notebook), *args)
-            else:
-                Console.user_output(
-                    command((notebook if command in WITH_NOTES else book1), *args)
-                )
+                with data_lock:
+                    Console.data_lock = data_lock  # prompts and pages of the command let it go
+                    try:
+                        Console.user_output(
+                            command((notebook if command in WITH_NOTES else book1), *args)
+                        )
+                    finally:
+                        Console.data_lock = None
+                if saver:
+                    autosave_touch(saver)  # written by the autosave thread
+                else:
+                    save_data(book1, notebook)
+    finally:
+        if saver and saver.is_alive():  # Ctrl+C or end of input, the last changes are still written
+            saver.stop()
 
 
 if __name__ == "__main__":
@@ -22,9 +22,9 @@ def input_error(func):
 
         except AttributeError:
             if languages:
-                return "Check the correctness of data inputs."
+                return AttributeError("Check the correctness of data inputs.")
             else:
-                return "Перевірте правильність набору даних."
+                return AttributeError("Перевірте правильність набору даних.")
 
         except ValueError as err:
             return err
@@ -58,9 +58,13 @@ def add_tag(notebook: NotePad, note, tag):
             raise ValueError("Enter  first_letters_of_the_note... #tag")
         else:
             raise ValueError("Введіть перші_літери_нотатки... #тег")
-    rec = quick_note_list(notebook, note)
-    rec.add_tag(HashTag(tag))
-    notebook.sorting()
+    rec = select_note(notebook, note)
+    if rec not in notebook.note_list:
+        if languages:
+            raise ValueError(f'Record "{rec}" not found')
+        else:
+            raise ValueError(f'Запис "{rec}" не знайдений')
+    notebook.add_tag(rec, HashTag(tag))
     if languages:
         return f'Tag "{tag}" added to record "{rec}"'
     else:
@@ -75,19 +79,13 @@ def change_note(notebook: NotePad, *args):
         else:
             raise ValueError("введіть частину тексту нотатки")      
     search_word = args[0]
-    if search_word.startswith("#"):
-        record = quick_tag(notebook, search_word)
-        new_note = f'{" ".join(args)}'
-        new_note = new_note.replace(f'{search_word} ', "")
-        if record:
-            notebook.change_note(record, new_note)
-            if languages:
-                return f'Note changed to "{new_note}"'
-            else:
-                return f'Запис змінено на "{new_note}"'
-    text = f'{" ".join(args)}'
-    old_note, new_note = text.split("... ")
-    record = quick_note_list(notebook, old_note)
+    if search_word.startswith(("#", "@")):
+        record = select_note(notebook, search_word)
+        new_note = " ".join(args[1:])
+    else:
+        text = f'{" ".join(args)}'
+        old_note, new_note = text.split("... ")
+        record = quick_note_list(notebook, old_note)
     if record in notebook.note_list:
         notebook.change_note(record, new_note)
         if languages:
@@ -95,23 +93,15 @@ def change_note(notebook: NotePad, *args):
         else:
             return f'Запис змінено на "{new_note}"'
     if languages:
-        return f'Record "{record}" not found'
+        raise ValueError(f'Record "{record}" not found')
     else:
-        return f'Запис "{record}" не знайдений'
+        raise ValueError(f'Запис "{record}" не знайдений')
 
 
 @input_error
 def change_note_stat(notebook: NotePad, *args):
     text = f'{" ".join(args)}'
-    if text.startswith("#"):
-        record = quick_tag(notebook, text)
-        if record:
-            notebook.change_status(record)
-            if languages:
-                return f'The status of {record} has been changed to "done"'
-            else:
-                return f'Статус нотатки {record} змінено на "виконано"'
-    record = quick_note_list(notebook, text)
+    record = select_note(notebook, text)
     if record in notebook.note_list:
         notebook.change_status(record)
         if languages:
@@ -119,9 +109,9 @@ def change_note_stat(notebook: NotePad, *args):
         else:
             return f'Статус нотатки {record} змінено на "виконано"'
     if languages:
-        return f'Record "{record}" not found'
+        raise ValueError(f'Record "{record}" not found')
     else:
-        return f'Запис "{record}" не знайдений'
+        raise ValueError(f'Запис "{record}" не знайдений')
 
 
 @input_error
@@ -132,27 +122,17 @@ def del_note(notebook: NotePad, *args):
             raise ValueError("enter part of note text or #tag")
         else:
             raise ValueError("введіть частину тексту нотатки або #тег")
-    if text.startswith("#"):
-        record = quick_tag(notebook, text)
-        if record:
-            notebook.delete(record)
-            notebook.sorting()
-            if languages:
-                return f'"{record}" deleted successfully'
-            else:
-                return f'"{record}" видалений успішно'
-    record = quick_note_list(notebook, text)
+    record = select_note(notebook, text)
     if record in notebook.note_list:
         notebook.delete(record)
-        notebook.sorting()
         if languages:
             return f'"{record}" deleted successfully'
         else:
             return f'"{record}" видалений успішно'
     if languages:
-        return f'Record "{record}" not found'
+        raise ValueError(f'Record "{record}" not found')
     else:
-        return f'Запис "{record}" не знайдений'
+        raise ValueError(f'Запис "{record}" не знайдений')
 
 
 @input_error
@@ -165,10 +145,7 @@ def search_note(notebook: NotePad, *args):
     else:
         error = "Запис не знайдений"
     if text.startswith("#"):
-        tag = text.replace("#", "")
-        for note in notebook.note_list:
-            for hashtag in note.tag_list:
-                list_of_notes.append(note) if tag in str(hashtag) else None
+        list_of_notes = notebook.tagged(text)
         if languages:
             output = (
                 f"Found notes for {text}"
@@ -182,9 +159,7 @@ def search_note(notebook: NotePad, *args):
                 + f'{", ".join(str(note) for note in list_of_notes)}'
             )
         return output if len(list_of_notes) != 0 else error
-    for note in notebook.note_list:
-        if text in str(note):
-            list_of_notes.append(note)
+    list_of_notes = notebook.search(text) if text.strip() else notebook.note_list
     if languages:
         output = (
             f"Found notes for {text}"
@@ -200,41 +175,110 @@ def search_note(notebook: NotePad, *args):
     return output if len(list_of_notes) != 0 else error
 
 
+def note_line(note: Note) -> str:
+    tags = ", ".join(str(tag) for tag in note.tag_list)
+    if languages:
+        return f'@{note.id} {tags} creation date: {note.day.strftime("%d-%m-%Y")}. Content:{str(note)}. Status:{f"done. Date done {note.done_date}"if note.done else "not done"}\n'
+    else:
+        return f'@{note.id} {tags} дата створення: {note.day.strftime("%d-%m-%Y")}. Зміст:{str(note)}. Статус:{f"виконано. Дата виконання {note.done_date}"if note.done else "не виконано"}\n'
+
+
 def show_notes(notebook: NotePad, *args):
-    line = ""
+    if languages:
+        yield "list of notes\n"
+    else:
+        yield "список нотатків\n"
     for note in notebook.note_list:
-        tags = ", ".join(str(tag) for tag in note.tag_list)
+        yield note_line(note)
+    if languages:
+        yield "end of list of notes"
+    else:
+        yield "кінець списку нотаток"
+
+
+def show_tags(notebook: NotePad, *args):
+    counts = notebook.tag_pool.counts()
+    if not counts:
         if languages:
-            line += (
-                f'{tags} creation date: {note.day.strftime("%d-%m-%Y")}. Content:{str(note)}. Status:{f"done. Date done {note.done_date}"if note.done else "not done"}'
-                + "\n"
-            )
+            return "No tags yet"
         else:
-            line += (
-                f'{tags} дата створення: {note.day.strftime("%d-%m-%Y")}. Зміст:{str(note)}. Статус:{f"виконано. Дата виконання {note.done_date}"if note.done else "не виконано"}'
-                + "\n"
-            )
+            return "Тегів ще немає"
+    return "\n".join(f"{tag}: {uses}" for tag, uses in counts)
+
+
+def show_archive(notebook: NotePad, *args):
+    if languages:
+        yield "archive of done notes\n"
+    else:
+        yield "архів виконаних нотаток\n"
+    for note in notebook.archived():
+        yield note_line(note)
     if languages:
-        return "list of notes\n" + line + "end of list of notes"
+        yield "end of archive"
     else:
-        return "список нотатків\n" + line + "кінець списку нотаток"
+        yield "кінець архіву"
+
+
+@input_error
+def search_archive(notebook: NotePad, *args):
+    text = " ".join(args)
+    if not text:
+        if languages:
+            raise ValueError("enter the words to search in the archive")
+        else:
+            raise ValueError("введіть слова для пошуку в архіві")
+    list_of_notes = notebook.archived(text)
+    if not list_of_notes:
+        if languages:
+            return "Record not found"
+        else:
+            return "Запис не знайдений"
+    return "".join(note_line(note) for note in list_of_notes)
+
+
+@input_error
+def restore_note(notebook: NotePad, *args):
+    text = " ".join(args)
+    if not text:
+        if languages:
+            raise ValueError("enter @ID or the words of an archived note")
+        else:
+            raise ValueError("введіть @ID або слова нотатки з архіву")
+    if text.startswith("@") and text[1:].isdigit():
+        record = next((note for note in notebook.archived() if note.id == int(text[1:])), text)
+    else:
+        record = quick_choice(notebook.archived(text.replace("...", "").strip()))
+    if not isinstance(record, Note):
+        if languages:
+            raise ValueError(f'Record "{record}" not found')
+        else:
+            raise ValueError(f'Запис "{record}" не знайдений')
+    notebook.restore(record)
+    if languages:
+        return f'"{record}" restored from the archive'
+    else:
+        return f'"{record}" повернуто з архіву'
+
+
+def select_note(notebook: NotePad, text: str):
+    # "@12" is the note with ID 12, "#tag" and "first_letters..." are chosen from a list
+    if text.startswith("@"):
+        note = notebook.get(int(text[1:])) if text[1:].isdigit() else None
+        return note or text
+    if text.startswith("#"):
+        return quick_tag(notebook, text)
+    return quick_note_list(notebook, text)
 
 
 def quick_tag(notebook: NotePad, text: str):
-    note_list = []
-    for note in notebook.note_list:
-        for tag in note.tag_list:
-            if str(text) in str(tag):
-                note_list.append(note)
+    # a whole tag is looked up directly, an unfinished one by its first letters
+    note_list = notebook.with_tag(text) or notebook.tagged(text)
     note = quick_choice(note_list)
     return note
 
 def quick_note_list(notebook: NotePad, text: str):
     content = text.replace("...", "")
-    note_list = []
-    for note in notebook.note_list:
-        if content in str(note):
-            note_list.append(note)
+    note_list = notebook.search(content.strip()) if content.strip() else notebook.note_list
     note = quick_choice(note_list)
     return note
 
@@ -267,7 +311,7 @@ def quick_choice(note_list):
         for i, note in enumerate(notes, start=1):
             Console.user_output(f"{i}. {note}")
 
-        Console.user_outputt(f'{options}: ')
+        Console.user_output(f'{options}: ')
         if next_index < note_count:
             Console.user_output(f'"next" {next}')
         Console.user_output(f'0. {exit}')
@@ -294,4 +338,8 @@ WITH_NOTES = [
     show_notes,
     search_note,
     del_note,
+    show_tags,
+    show_archive,
+    search_archive,
+    restore_note,
 ]
\ No newline at end of file
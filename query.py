@@ -0,0 +1,127 @@
+"""query command: field=value predicates joined with and, or and brackets"""
+from ab_classes import languages
+from calendar import month_abbr, month_name
+from indexes import FieldIndexes
+import re
+
+
+TOKENS = re.compile(r"\(|\)|[^\s()]+")
+MONTHS = {name.lower(): number for names in (month_name, month_abbr) for number, name in enumerate(names) if name}
+
+
+def query_error(eng: str, ukr: str) -> ValueError:
+    return ValueError(eng if languages else ukr)
+
+
+def field_value(field: str, value: str):
+    # the value in the form kept by FieldIndexes, "-" asks for a missing field
+    if value == "-":
+        if field == "phones":
+            return 0
+        return None
+    if field == "email":
+        return value.lstrip("@").casefold()
+    if field == "address":
+        return value.casefold()
+    if field == "phones" and value.isdigit():
+        return int(value)
+    if field == "month":
+        month = int(value) if value.isdigit() else MONTHS.get(value.lower())
+        if month is not None and 1 <= month <= 12:
+            return month
+    raise query_error(f"Wrong value {value} for {field}", f"Невірне значення {value} для {field}")
+
+
+class Query:
+    # the tree of a query is ("or", [...]), ("and", [...]) or ("eq", field, value)
+    def __init__(self, book, text: str):
+        self.book = book
+        self.tokens = TOKENS.findall(text)
+        self.pos = 0
+        self.sets = {}  # (field, value) -> keys, every index is read once
+        self.tree = self.parse_or()
+        if self.pos < len(self.tokens):
+            raise query_error(f"Unexpected {self.tokens[self.pos]}", f"Зайве {self.tokens[self.pos]}")
+
+    def next_token(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while (self.next_token() or "").lower() == "or":
+            self.pos += 1
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def parse_and(self):
+        nodes = [self.parse_term()]
+        while (self.next_token() or "").lower() == "and":
+            self.pos += 1
+            nodes.append(self.parse_term())
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def parse_term(self):
+        token = self.next_token()
+        if token is None:
+            raise query_error(
+                "Enter the query, for example: email=gmail.com and (month=3 or phones=0)",
+                "Введіть запит, наприклад: email=gmail.com and (month=3 or phones=0)",
+            )
+        self.pos += 1
+        if token == "(":
+            node = self.parse_or()
+            if self.next_token() != ")":
+                raise query_error("Missing )", "Не вистачає )")
+            self.pos += 1
+            return node
+        field, sign, value = token.partition("=")
+        field = field.lower()
+        if not sign or field not in FieldIndexes.FIELDS:
+            raise query_error(
+                f"Use field=value, fields: {', '.join(FieldIndexes.FIELDS)}",
+                f"Використовуйте поле=значення, поля: {', '.join(FieldIndexes.FIELDS)}",
+            )
+        return ("eq", field, field_value(field, value))
+
+    def lookup(self, field, value) -> set:
+        keys = self.sets.get((field, value))
+        if keys is None:
+            keys = self.sets[(field, value)] = self.book.fields.lookup(field, value)
+        return keys
+
+    def estimate(self, node) -> int:
+        # number of contacts the node can match, from the sizes of the indexes
+        if node[0] == "eq":
+            return self.book.fields.count(node[1], node[2])
+        sizes = [self.estimate(child) for child in node[1]]
+        return min(sizes) if node[0] == "and" else sum(sizes)
+
+    def matches(self, node, key) -> bool:
+        if node[0] == "eq":
+            return key in self.lookup(node[1], node[2])
+        if node[0] == "and":
+            return all(self.matches(child, key) for child in node[1])
+        return any(self.matches(child, key) for child in node[1])
+
+    def evaluate(self, node) -> set:
+        if node[0] == "eq":
+            return self.lookup(node[1], node[2])
+        if node[0] == "or":
+            keys = set()
+            for child in node[1]:
+                keys |= self.evaluate(child)
+            return keys
+        # the most selective predicate gives the candidates, the others only check them
+        children = sorted(node[1], key=self.estimate)
+        keys = set(self.evaluate(children[0]))
+        for child in children[1:]:
+            if not keys:
+                break
+            if child[0] == "eq":
+                keys &= self.lookup(child[1], child[2])
+            else:
+                keys = {key for key in keys if self.matches(child, key)}
+        return keys
+
+    def run(self) -> list:
+        return [self.book.data[key] for key in sorted(self.evaluate(self.tree))]
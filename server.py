@@ -0,0 +1,131 @@
+"""local server for the commands of main.py, the book and the notebook stay loaded between clients
+
+Protocol: the client sends a command line (answers to questions after "|" as in batch mode),
+the server replies with the output lines, a line starting with "." gets one more "." in front,
+and the reply ends with the line ".ok" or ".error".
+"""
+from collections.abc import Iterator
+import asyncio
+import os
+
+
+def parse_address(address: str):
+    # "unix:/path/to/socket", "host:port" or ":port" for localhost
+    if address.startswith("unix:"):
+        return address[5:], None
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def reply_lines(text: str):
+    for line in text.split("\n"):
+        yield "." + line if line.startswith(".") else line
+
+
+class ReadWriteLock:
+    # reads share the lock, a write runs alone; reads only wait for a running write, so
+    # quick reads are not held up behind a write that waits for a long listing
+    def __init__(self):
+        self.readers = 0
+        self.writing = False
+        self.changed = asyncio.Condition()
+
+    async def acquire_read(self) -> None:
+        async with self.changed:
+            await self.changed.wait_for(lambda: not self.writing)
+            self.readers += 1
+
+    async def release_read(self) -> None:
+        async with self.changed:
+            self.readers -= 1
+            if not self.readers:
+                self.changed.notify_all()
+
+    async def acquire_write(self) -> None:
+        async with self.changed:
+            await self.changed.wait_for(lambda: not self.writing and not self.readers)
+            self.writing = True
+
+    async def release_write(self) -> None:
+        async with self.changed:
+            self.writing = False
+            self.changed.notify_all()
+
+
+class CommandServer:
+    def __init__(self, start, is_read, is_exit, commit, failure):
+        self.start = start  # line -> (ok, printed, result), see main.start_command
+        self.is_read = is_read
+        self.is_exit = is_exit  # exit would close the storage of every client, it ends the connection instead
+        self.commit = commit
+        self.failure = failure
+        self.lock = ReadWriteLock()
+        self.clients = 0
+
+    async def send(self, writer, text: str) -> None:
+        if text:
+            writer.write(("\n".join(reply_lines(text.rstrip("\n"))) + "\n").encode("utf-8"))
+            await writer.drain()
+
+    async def run(self, line: str, writer) -> bool:
+        read = self.is_read(line)
+        if read:
+            await self.lock.acquire_read()
+        else:
+            await self.lock.acquire_write()
+        try:
+            ok, printed, result = self.start(line)
+            await self.send(writer, printed)
+            if isinstance(result, Iterator):
+                # long listings go out chunk by chunk, other clients are served in between
+                chunks = []
+                try:
+                    for chunk in result:
+                        chunks.append(chunk)
+                        if len(chunks) == 64:
+                            await self.send(writer, "".join(chunks))
+                            chunks = []
+                            await asyncio.sleep(0)  # drain() does not yield while the buffer is low
+                except Exception as err:
+                    ok = False
+                    chunks.append("\n" + self.failure(err))
+                await self.send(writer, "".join(chunks))
+            elif result is not None:
+                await self.send(writer, str(result))
+            if not read:
+                self.commit()
+        finally:
+            if read:
+                await self.lock.release_read()
+            else:
+                await self.lock.release_write()
+        return ok
+
+    async def handle(self, reader, writer) -> None:
+        self.clients += 1
+        try:
+            while line := await reader.readline():
+                if not line.endswith(b"\n"):  # cut off by a dropped connection, never run half a command
+                    break
+                line = line.decode("utf-8").strip()
+                if self.is_exit(line):
+                    break
+                ok = await self.run(line, writer) if line else True
+                writer.write(b".ok\n" if ok else b".error\n")
+                await writer.drain()
+        except (ConnectionError, UnicodeDecodeError):
+            pass
+        finally:
+            self.clients -= 1
+            writer.close()
+
+    async def serve(self, address: str) -> None:
+        host, port = parse_address(address)
+        if port is None:
+            if os.path.exists(host):
+                os.remove(host)
+            server = await asyncio.start_unix_server(self.handle, host)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
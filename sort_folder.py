@@ -127,17 +127,17 @@ def sort(work_path):
 
     if not work_path:
         if languages:
-            return "Please specify the target path in the parameters"
+            raise ValueError("Please specify the target path in the parameters")
         else:
-            return "Будь ласка вкажіть цільовий шлях в параметрах"
+            raise ValueError("Будь ласка вкажіть цільовий шлях в параметрах")
 
     path = Path(work_path)
 
     if not path.exists():
         if languages:
-            return "The specified path does not exist"
+            raise FileNotFoundError("The specified path does not exist")
         else:
-            return "Вказаний шлях не існує"
+            raise FileNotFoundError("Вказаний шлях не існує")
     try:
         normalize_all(path)
 
@@ -158,9 +158,9 @@ def sort(work_path):
 
     except PermissionError:
         if languages:
-            return "No change is allowed. Close the target folder or its subfolders in all other applications."
+            raise PermissionError("No change is allowed. Close the target folder or its subfolders in all other applications.")
         else:
-            return "Немає дозволу на зміни. Закрийте цільову теку або її підтеки в усіх інших додатках."
+            raise PermissionError("Немає дозволу на зміни. Закрийте цільову теку або її підтеки в усіх інших додатках.")
     if languages:
         output = f"""Found files of known types: {', '.join(f for f in known_types)}. Total {len(known_types)} files.
 Found files of unknown types: {', '.join(f for f in unknown_types)}. total {len(unknown_types)} files.
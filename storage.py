@@ -0,0 +1,502 @@
+"""SQLite storage engine for AddressBook and NotePad"""
+from ab_classes import AddressBook, Cursor, Note, NotePad, Record
+from archive import NoteArchive
+from collections import defaultdict
+from collections.abc import MutableMapping
+from indexes import BirthdayIndex, FieldIndexes, PhoneIndex
+import sqlite3
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contacts (
+    name TEXT PRIMARY KEY,
+    email TEXT,
+    address TEXT,
+    birthday TEXT,
+    bday_key INTEGER,
+    phone_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS contacts_bday ON contacts (bday_key);
+CREATE TABLE IF NOT EXISTS contact_words (
+    word TEXT NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (word, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS contact_words_name ON contact_words (name);
+CREATE TABLE IF NOT EXISTS phones (
+    phone TEXT NOT NULL,
+    name TEXT NOT NULL,
+    pos INTEGER NOT NULL,
+    rev TEXT NOT NULL,
+    PRIMARY KEY (phone, name)
+);
+CREATE INDEX IF NOT EXISTS phones_name ON phones (name);
+CREATE INDEX IF NOT EXISTS phones_rev ON phones (rev);
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY,
+    day TEXT,
+    done INTEGER,
+    done_date TEXT,
+    text TEXT
+);
+CREATE TABLE IF NOT EXISTS note_tags (note_id INTEGER NOT NULL, tag TEXT NOT NULL);
+DROP INDEX IF EXISTS note_tags_tag;
+CREATE INDEX IF NOT EXISTS note_tags_note ON note_tags (note_id);
+CREATE TABLE IF NOT EXISTS notes_archive (
+    id INTEGER PRIMARY KEY,
+    day TEXT,
+    done INTEGER,
+    done_date TEXT,
+    text TEXT,
+    tags TEXT
+);
+"""
+
+# after the migration of older files, which have no phone_count column
+FIELD_INDEXES = """
+CREATE INDEX IF NOT EXISTS contacts_email_domain ON contacts (email_domain(email));
+CREATE INDEX IF NOT EXISTS contacts_phone_count ON contacts (phone_count);
+CREATE INDEX IF NOT EXISTS contacts_no_address ON contacts (name) WHERE address IS NULL;
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts
+USING fts5 (name, body, tokenize="trigram case_sensitive 1")
+"""
+
+
+def email_domain(email):
+    return FieldIndexes.values(None, (), email, None)["email"][0]
+
+
+def address_words(address) -> list:
+    return [word for word in FieldIndexes.values(None, (), None, address)["address"] if word is not None]
+
+
+def upper_bound(prefix: str) -> str:
+    # smallest string greater than every string starting with prefix
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class SqliteStorage:
+    def __init__(self, filename: str):
+        self.db = sqlite3.connect(filename)
+        # the email index is built on this function, it has to be there before any write
+        self.db.create_function("email_domain", 1, email_domain, deterministic=True)
+        self.is_new = not self.db.execute("SELECT name FROM sqlite_master").fetchone()
+        self.db.executescript(SCHEMA)
+        if "phone_count" not in {row[1] for row in self.db.execute("PRAGMA table_info(contacts)")}:
+            self.add_field_columns()
+        if not {row[1]: row[5] for row in self.db.execute("PRAGMA table_info(phones)")}["name"]:
+            self.share_phones()
+        self.db.executescript(FIELD_INDEXES)
+        try:
+            self.db.execute(FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError:  # SQLite without FTS5 trigram tokenizer
+            self.fts = False
+        self.closed = False
+
+    def add_field_columns(self) -> None:
+        self.db.execute("ALTER TABLE contacts ADD COLUMN phone_count INTEGER NOT NULL DEFAULT 0")
+        self.db.execute("UPDATE contacts SET phone_count = (SELECT count(*) FROM phones WHERE phones.name = contacts.name)")
+        rows = self.db.execute("SELECT name, address FROM contacts WHERE address IS NOT NULL").fetchall()
+        self.db.executemany(
+            "INSERT OR IGNORE INTO contact_words (word, name) VALUES (?, ?)",
+            [(word, name) for name, address in rows for word in address_words(address)],
+        )
+        self.db.commit()
+
+    def share_phones(self) -> None:
+        # older files keyed phones by the number alone, a shared number replaced the other contact's row
+        self.db.executescript(
+            """
+            DROP INDEX IF EXISTS phones_name;
+            DROP INDEX IF EXISTS phones_rev;
+            ALTER TABLE phones RENAME TO phones_old;
+            CREATE TABLE phones (
+                phone TEXT NOT NULL,
+                name TEXT NOT NULL,
+                pos INTEGER NOT NULL,
+                rev TEXT NOT NULL,
+                PRIMARY KEY (phone, name)
+            );
+            INSERT INTO phones (phone, name, pos, rev) SELECT phone, name, pos, rev FROM phones_old;
+            DROP TABLE phones_old;
+            CREATE INDEX phones_name ON phones (name);
+            CREATE INDEX phones_rev ON phones (rev);
+            """
+        )
+
+    def commit(self, store=None) -> None:
+        self.db.commit()
+
+    def close(self) -> None:
+        if not self.closed:
+            self.db.commit()
+            self.db.close()
+            self.closed = True
+
+
+class SqliteContacts(MutableMapping):
+    # AddressBook.data on top of the contacts table, records are built on access
+    def __init__(self, book, db):
+        self.book = book
+        self.db = db
+        self.cache = {}
+
+    def __getitem__(self, key):
+        record = self.cache.get(key)
+        if record is None:
+            row = self.db.execute(
+                "SELECT name, email, address, birthday FROM contacts WHERE name = ?", (key,)
+            ).fetchone()
+            if row is None:
+                raise KeyError(key)
+            phones = self.db.execute(
+                "SELECT phone FROM phones WHERE name = ? ORDER BY pos", (key,)
+            ).fetchall()
+            record = Record.from_dict(
+                {
+                    "name": row[0],
+                    "phones": [phone for phone, in phones],
+                    "email": row[1],
+                    "address": row[2],
+                    "birthday": row[3],
+                },
+                trusted=True,
+            )
+            record.book = self.book
+            self.cache[key] = record
+        return record
+
+    def __setitem__(self, key, record):
+        # rows are written by SqliteAddressBook._index_record
+        self.cache[key] = record
+
+    def __delitem__(self, key):
+        row = self.db.execute("SELECT rowid FROM contacts WHERE name = ?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        self.db.execute("DELETE FROM contacts WHERE name = ?", (key,))
+        self.db.execute("DELETE FROM phones WHERE name = ?", (key,))
+        self.db.execute("DELETE FROM contact_words WHERE name = ?", (key,))
+        if self.book.fts:
+            self.db.execute("DELETE FROM contacts_fts WHERE rowid = ?", row)
+        self.cache.pop(key, None)
+
+    def __contains__(self, key):
+        if key in self.cache:
+            return True
+        return self.db.execute("SELECT 1 FROM contacts WHERE name = ?", (key,)).fetchone() is not None
+
+    def __iter__(self):
+        for name, in self.db.execute("SELECT name FROM contacts ORDER BY rowid"):
+            yield name
+
+    def __len__(self):
+        return self.db.execute("SELECT count(*) FROM contacts").fetchone()[0]
+
+    def raw(self, key) -> dict:
+        return self[key].to_dict()
+
+    def write(self, record: Record) -> None:
+        name = record.name.value
+        birthday = record.birthday.value if record.birthday else None
+        self.db.execute(
+            "INSERT INTO contacts (name, email, address, birthday, bday_key, phone_count) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET email = excluded.email, address = excluded.address, "
+            "birthday = excluded.birthday, bday_key = excluded.bday_key, phone_count = excluded.phone_count",
+            (
+                name,
+                record.email.value if record.email else None,
+                record.address.value if record.address else None,
+                str(record.birthday) if record.birthday else None,
+                BirthdayIndex.day_key(birthday) if birthday else None,
+                len(record.phones),
+            ),
+        )
+        self.db.execute("DELETE FROM phones WHERE name = ?", (name,))
+        self.db.executemany(
+            "INSERT OR REPLACE INTO phones (phone, name, pos, rev) VALUES (?, ?, ?, ?)",
+            [(phone.value, name, pos, phone.value[::-1]) for pos, phone in enumerate(record.phones)],
+        )
+        self.db.execute("DELETE FROM contact_words WHERE name = ?", (name,))
+        if record.address:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO contact_words (word, name) VALUES (?, ?)",
+                [(word, name) for word in address_words(record.address.value)],
+            )
+        if self.book.fts:
+            rowid = self.db.execute("SELECT rowid FROM contacts WHERE name = ?", (name,)).fetchone()[0]
+            self.db.execute("DELETE FROM contacts_fts WHERE rowid = ?", (rowid,))
+            self.db.execute(
+                "INSERT INTO contacts_fts (rowid, name, body) VALUES (?, ?, ?)",
+                (rowid, name, "\n".join(record.search_fields()[1:])),
+            )
+
+
+class SqliteTrigrams:
+    def __init__(self, book, db):
+        self.book = book
+        self.db = db
+
+    def candidates(self, pattern: str) -> set:
+        if len(pattern) < 3:
+            return None
+        if self.book.fts:
+            rows = self.db.execute(
+                "SELECT name FROM contacts_fts WHERE contacts_fts MATCH ?",
+                ('"' + pattern.replace('"', '""') + '"',),
+            )
+        else:
+            rows = self.db.execute(
+                "SELECT name FROM contacts WHERE instr(name, ?1) OR instr(email, ?1) OR instr(address, ?1) "
+                "UNION SELECT name FROM phones WHERE instr(phone, ?1)",
+                (pattern,),
+            )
+        return {name for name, in rows}
+
+
+class SqliteBirthdays:
+    def __init__(self, db):
+        self.db = db
+
+    def window(self, start, days: int) -> list:
+        keys = []
+        for lo, hi in BirthdayIndex.ranges(start, days):
+            rows = self.db.execute(
+                "SELECT name FROM contacts WHERE bday_key BETWEEN ? AND ? ORDER BY bday_key, name",
+                (lo, hi),
+            )
+            keys.extend(name for name, in rows)
+        return keys
+
+
+class SqlitePhones:
+    def __init__(self, db):
+        self.db = db
+
+    def owner(self, phone: str):
+        row = self.db.execute("SELECT min(name) FROM phones WHERE phone = ?", (phone,)).fetchone()
+        return row[0]
+
+    def owners_of(self, phone: str) -> list:
+        return [name for name, in self.db.execute("SELECT name FROM phones WHERE phone = ? ORDER BY name", (phone,))]
+
+    def lookup(self, digits: str) -> list:
+        if len(digits) < PhoneIndex.min_suffix:
+            return []
+        rev = digits[::-1]
+        rows = self.db.execute(
+            "SELECT DISTINCT phone FROM phones WHERE rev >= ? AND rev < ? ORDER BY phone",
+            (rev, upper_bound(rev)),
+        )
+        return [phone for phone, in rows]
+
+
+class SqliteFields:
+    # FieldIndexes on top of the contacts table, every condition is answered by an index
+    WHERE = {
+        "email": ("email_domain(email) IS NULL", "email_domain(email) = ?"),
+        "phones": (None, "phone_count = ?"),
+        "month": ("bday_key IS NULL", "bday_key BETWEEN ? * 100 AND ? * 100 + 99"),
+        "address": ("address IS NULL", "name IN (SELECT name FROM contact_words WHERE word = ?)"),
+    }
+
+    def __init__(self, db):
+        self.db = db
+
+    def where(self, field, value) -> tuple:
+        missing, equal = self.WHERE[field]
+        if value is None:
+            return missing, ()
+        return equal, (value,) * equal.count("?")
+
+    def lookup(self, field, value) -> set:
+        where, params = self.where(field, value)
+        return {name for name, in self.db.execute(f"SELECT name FROM contacts WHERE {where}", params)}
+
+    def count(self, field, value) -> int:
+        where, params = self.where(field, value)
+        return self.db.execute(f"SELECT count(*) FROM contacts WHERE {where}", params).fetchone()[0]
+
+
+class SqliteCursor(Cursor):
+    # keyset pagination, every page is one indexed query
+    def __init__(self, book, page, by_name=False, after=None):
+        self.book = book
+        self.page = page
+        self.by_name = by_name
+        self.column = "name" if by_name else "rowid"
+        self.position = "" if by_name else 0
+        self.key = None
+        if after is not None:
+            self.seek(after)
+
+    def seek(self, key) -> None:
+        if self.by_name:
+            self.position = key
+        else:
+            self.position = self.book.data.db.execute(
+                "SELECT rowid FROM contacts WHERE name = ?", (key,)
+            ).fetchone()[0]
+        self.key = key
+
+    def __next__(self) -> list:
+        rows = self.book.data.db.execute(
+            f"SELECT name, {self.column} FROM contacts WHERE {self.column} > ? "
+            f"ORDER BY {self.column} LIMIT ?",
+            (self.position, self.page),
+        ).fetchall()
+        if not rows:
+            raise StopIteration
+        self.key, self.position = rows[-1]
+        return [self.book.data[name] for name, _ in rows]
+
+
+class SqliteAddressBook(AddressBook):
+    def __init__(self, storage: SqliteStorage):
+        super().__init__()
+        self.fts = storage.fts
+        self.data = SqliteContacts(self, storage.db)
+        self.trigrams = SqliteTrigrams(self, storage.db)
+        self.birthdays = SqliteBirthdays(storage.db)
+        self.numbers = SqlitePhones(storage.db)
+        self.fields = SqliteFields(storage.db)
+        for name, in storage.db.execute("SELECT name FROM contacts"):
+            self.names.add(name)
+
+    def values(self):
+        return (self.data[key] for key in self.data)
+
+    def iterator(self, page, by_name=False, after=None):
+        return SqliteCursor(self, page, by_name, after)
+
+    def _index_record(self, record: Record) -> None:
+        self.data.write(record)
+        self.names.add(record.name.value)
+
+    def _unindex_record(self, record: Record) -> None:
+        pass
+
+    def remove_record(self, contact: str) -> None:
+        record = self.data.pop(contact)
+        self.names.discard(contact)
+        record.book = None
+        return record
+
+
+class SqliteNotePad(NotePad):
+    # note IDs are the ids of the notes table; unlike the contacts, the notes are read once at
+    # startup, ranking, text search, tag prefixes and completion all work on the NotePad indexes
+    def __init__(self, storage: SqliteStorage):
+        super().__init__()
+        self.db = storage.db
+        tags = defaultdict(list)
+        for note_id, tag in self.db.execute("SELECT note_id, tag FROM note_tags"):
+            tags[note_id].append(tag)
+        for note_id, day, done, done_date, text in self.db.execute(
+            "SELECT id, day, done, done_date, text FROM notes ORDER BY id"
+        ):
+            note = Note("")
+            note.from_dict(
+                {
+                    "id": note_id,
+                    "day": day,
+                    "done": bool(done),
+                    "done_date": done_date,
+                    "text": text,
+                    "tag_list": sorted(tags[note_id]),
+                },
+                self.tag_pool,
+            )
+            self.note_list.append(note)
+        self.build_indexes()
+        # archived notes keep their IDs, new notes must not take them
+        last_archived = self.db.execute("SELECT MAX(id) FROM notes_archive").fetchone()[0]
+        self.next_id = max(self.next_id, (last_archived or 0) + 1)
+
+    def load_from_file(self, note_file):
+        super().load_from_file(note_file)
+        for note in self.note_list:
+            self._write(note)
+
+    def _log(self, *entry):
+        pass
+
+    def _write(self, note: Note) -> None:
+        data = note.to_dict()
+        self.db.execute(
+            "INSERT OR REPLACE INTO notes (id, day, done, done_date, text) VALUES (?, ?, ?, ?, ?)",
+            (note.id, data["day"], data["done"], data["done_date"], data["text"]),
+        )
+        self.db.execute("DELETE FROM note_tags WHERE note_id = ?", (note.id,))
+        self.db.executemany(
+            "INSERT INTO note_tags (note_id, tag) VALUES (?, ?)",
+            [(note.id, tag) for tag in data["tag_list"]],
+        )
+
+    def add_note(self, note):
+        super().add_note(note)
+        self._write(note)
+
+    def change_note(self, note, new_note):
+        super().change_note(note, new_note)
+        self._write(note)
+
+    def change_status(self, note, done_date=None):
+        super().change_status(note, done_date)
+        self._write(note)
+
+    def restore(self, note):
+        # the notes row and the archive row change in the same transaction
+        super().restore(note)
+        self.journal_entries()
+        self.journal_written()
+
+    def add_tag(self, note, tag):
+        super().add_tag(note, tag)
+        self._write(note)
+
+    def _drop(self, note):
+        super()._drop(note)
+        self.db.execute("DELETE FROM notes WHERE id = ?", (note.id,))
+        self.db.execute("DELETE FROM note_tags WHERE note_id = ?", (note.id,))
+
+
+class SqliteArchive(NoteArchive):
+    # archived notes in the notes_archive table, moved in the same transaction as the notes rows
+    def __init__(self, storage: SqliteStorage):
+        super().__init__(None)
+        self.db = storage.db
+
+    def read(self):
+        for note_id, day, done, done_date, text, tags in self.db.execute(
+            "SELECT id, day, done, done_date, text, tags FROM notes_archive ORDER BY id"
+        ):
+            note = Note("")
+            note.from_dict(
+                {
+                    "id": note_id,
+                    "day": day,
+                    "done": bool(done),
+                    "done_date": done_date,
+                    "text": text,
+                    "tag_list": tags.split() if tags else [],
+                }
+            )
+            yield note_id, note
+
+    def write(self, notes: list) -> None:
+        rows = []
+        for note in notes:
+            data = note.to_dict()
+            rows.append((note.id, data["day"], data["done"], data["done_date"], data["text"], " ".join(data["tag_list"])))
+        self.db.executemany(
+            "INSERT OR REPLACE INTO notes_archive (id, day, done, done_date, text, tags) VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+
+    def erase(self, note_id: int) -> None:
+        self.db.execute("DELETE FROM notes_archive WHERE id = ?", (note_id,))
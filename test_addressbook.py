@@ -0,0 +1,273 @@
+"""AddressBook loading, indexes and lookups: python -m unittest test_addressbook"""
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from ab_classes import Address, AddressBook, Birthday, Console, Email, Name, Phone, Record
+from indexes import PhoneIndex
+from storage import SqliteAddressBook, SqliteStorage
+
+
+def saved_contact(name: str, *phones, email=None, address=None, birthday=None) -> dict:
+    return {"name": name, "phones": list(phones), "email": email, "address": address, "birthday": birthday}
+
+
+class SavedFileTestCase(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+
+    def write_file(self, *contacts) -> str:
+        path = os.path.join(self.folder.name, "phonebook.JSON")
+        with open(path, "w") as db:
+            json.dump({contact["name"]: contact for contact in contacts}, db)
+        return path
+
+    def load(self, path: str, lazy: bool) -> AddressBook:
+        book = AddressBook(lazy=lazy)
+        book.load_from_file(path)
+        return book
+
+
+class LazyLoadTest(SavedFileTestCase):
+    def test_records_are_built_on_access(self):
+        path = self.write_file(saved_contact("Ann", "+380501234567"), saved_contact("Bob"))
+        book = self.load(path, lazy=True)
+        self.assertIs(type(book.data.items["Ann"]), dict)
+        self.assertEqual(book.numbers.lookup("4567"), ["+380501234567"])  # indexes work on the dicts
+        self.assertIs(type(book.data.items["Ann"]), dict)
+        record = book.get("Ann")
+        self.assertIsInstance(record, Record)
+        self.assertIs(book.data.items["Ann"], record)
+        self.assertIs(record.book, book)
+
+    def test_save_keeps_untouched_dicts(self):
+        path = self.write_file(saved_contact("Ann", "+380501234567"), saved_contact("Bob", birthday=726469))
+        book = self.load(path, lazy=True)
+        book.get("Ann").add_email(Email("ann@mail.com"))
+        self.assertEqual(book.changed, {"Ann"})
+        self.assertIs(type(book.data.items["Bob"]), dict)
+        copy = os.path.join(self.folder.name, "copy.JSON")
+        book.save_to_file(copy)
+        with open(copy) as db:
+            saved = json.load(db)
+        self.assertEqual(saved["Ann"]["email"], "ann@mail.com")
+        self.assertEqual(saved["Bob"], saved_contact("Bob", birthday=726469))
+
+    def test_shared_number_in_a_saved_file(self):
+        # older versions allowed it, loading must not refuse the file
+        path = self.write_file(saved_contact("Ann", "+380501234567"), saved_contact("Bob", "+380501234567"))
+        for lazy in (True, False):
+            book = self.load(path, lazy)
+            self.assertEqual(sorted(book), ["Ann", "Bob"], lazy)
+            self.assertEqual(str(book.get("Bob").phones[0]), "+380501234567")
+            self.assertFalse(book.changed)
+
+    def test_new_input_still_refuses_a_taken_number(self):
+        path = self.write_file(saved_contact("Ann", "+380501234567"))
+        for lazy in (True, False):
+            book = self.load(path, lazy)
+            with self.assertRaises(IndexError):
+                book.add_record(Record(Name("Cat"), Phone("0501234567")))
+
+
+class SavedPhoneTest(SavedFileTestCase):
+    def test_records_have_no_instance_dict(self):
+        record = Record(Name("Ann"), Phone("0501234567"), Email("ann@mail.com"), Address("Kyiv, Main 1"))
+        for obj in (record, record.name, record.phones[0], record.email, record.address, Birthday("02.01.1990")):
+            self.assertFalse(hasattr(obj, "__dict__"), type(obj).__name__)
+        self.assertIsInstance(record.phones[0]._value, int)
+        self.assertIs(Name.trusted("".join(["A", "nn"])).value, record.name.value)  # interned
+
+    def test_trusted_packs_a_normalized_number(self):
+        self.assertEqual(Phone.trusted("+380501234567").value, "+380501234567")
+
+    def test_trusted_checks_other_layouts(self):
+        self.assertEqual(Phone.trusted("0501234567").value, "+380501234567")
+        self.assertEqual(Phone.trusted("+380 50 123 45 67").value, "+380501234567")
+        for value in ("+38050123", "phone"):
+            with self.assertRaises(ValueError, msg=value):
+                Phone.trusted(value)
+
+    def test_hand_edited_file(self):
+        path = self.write_file(saved_contact("Ann", "0501234567", "+380 67 765 43 21"))
+        for lazy in (True, False):
+            book = self.load(path, lazy)
+            self.assertEqual([rec.name.value for _, rec in book.find_phone("0501234567")], ["Ann"], lazy)
+            self.assertEqual([rec.name.value for _, rec in book.find_phone("4321")], ["Ann"], lazy)
+            self.assertEqual([phone.value for phone in book.get("Ann").phones], ["+380501234567", "+380677654321"])
+            book.remove_record("Ann")
+            self.assertEqual(book.numbers.owners, {})
+
+
+class FindPhoneTest(unittest.TestCase):
+    def test_whole_number_and_suffix(self):
+        book = AddressBook()
+        book.add_record(Record(Name("Ann"), Phone("0501234567")))
+        book.add_record(Record(Name("Bob"), Phone("+380671234567")))
+        self.assertEqual([rec.name.value for _, rec in book.find_phone("050 123 45 67")], ["Ann"])
+        self.assertEqual([rec.name.value for _, rec in book.find_phone("380671234567")], ["Bob"])
+        self.assertEqual([phone for phone, _ in book.find_phone("45-67")], ["+380501234567", "+380671234567"])
+        self.assertEqual(book.find_phone("0991234567"), [])
+
+
+class CursorTest(unittest.TestCase):
+    def setUp(self):
+        self.book = AddressBook()
+        for name in ("Cat", "Ann", "Eve", "Bob", "Dan"):
+            self.book.add_record(Record(Name(name)))
+
+    def names(self, pages) -> list:
+        return [[rec.name.value for rec in page] for page in pages]
+
+    def test_pages_in_insertion_and_name_order(self):
+        self.assertEqual(self.names(self.book.iterator(2)), [["Cat", "Ann"], ["Eve", "Bob"], ["Dan"]])
+        self.assertEqual(self.names(self.book.iterator(2, by_name=True)), [["Ann", "Bob"], ["Cat", "Dan"], ["Eve"]])
+
+    def test_resume_after_a_key(self):
+        self.assertEqual(self.names(self.book.iterator(2, by_name=True, after="Bob")), [["Cat", "Dan"], ["Eve"]])
+        self.assertEqual(self.names(self.book.iterator(3, after="Eve")), [["Bob", "Dan"]])
+
+    def test_removed_contacts_are_skipped(self):
+        cursor = self.book.iterator(2)
+        self.assertEqual(self.names([next(cursor)]), [["Cat", "Ann"]])
+        self.book.remove_record("Eve")
+        self.assertEqual(self.names(cursor), [["Bob", "Dan"]])
+        self.assertEqual(cursor.key, "Dan")
+
+
+class CompleteTest(unittest.TestCase):
+    def test_names_follow_the_book(self):
+        book = AddressBook()
+        for name in ("Ann Lee", "Anna Ray", "Bob"):
+            book.add_record(Record(Name(name)))
+        self.assertEqual(book.complete("An"), ["Ann Lee", "Anna Ray"])
+        book.remove_record("Ann Lee")
+        book.add_record(Record(Name("Andy")))
+        self.assertEqual(book.complete("An"), ["Andy", "Anna Ray"])
+        self.assertEqual(book.complete("An", 1), ["Andy"])
+
+
+class RenderCacheTest(unittest.TestCase):
+    def test_mutators_clear_the_cached_line(self):
+        record = Record(Name("Ann"), Phone("0501234567"))
+        hits, misses, _ = Record.render_stats()
+        first = str(record)
+        self.assertIs(str(record), first)
+        record.add_email(Email("ann@mail.com"))
+        self.assertIn("ann@mail.com", str(record))
+        record.edit_phone(Phone("0671234567"))
+        self.assertIn("+380671234567", str(record))
+        self.assertEqual(Record.render_stats()[:2], (hits + 1, misses + 3))
+
+
+class StreamTest(SavedFileTestCase):
+    def test_show_all_builds_records_as_it_goes(self):
+        path = self.write_file(saved_contact("Ann"), saved_contact("Bob"))
+        book = self.load(path, lazy=True)
+        lines = book.show_all()
+        self.assertTrue(next(lines).startswith("Ann:"))
+        self.assertIs(type(book.data.items["Bob"]), dict)
+        self.assertEqual(list(lines)[-1], "Total: 2 contacts.")
+
+    def test_console_writes_the_chunks(self):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            Console.user_output(iter(["one\n", "two"]))
+            Console.user_output("three")
+        self.assertEqual(out.getvalue(), "one\ntwo\nthree\n")
+
+
+class SharedNumberTest(SavedFileTestCase):
+    def test_phone_index_keeps_every_owner(self):
+        index = PhoneIndex()
+        index.add("Ann", "+380501234567")
+        index.add("Bob", "+380501234567")
+        self.assertEqual(index.owners_of("+380501234567"), ["Ann", "Bob"])
+        index.discard("Cat", "+380501234567")
+        index.discard("Ann", "+380501234567")
+        self.assertEqual(index.owner("+380501234567"), "Bob")
+        self.assertEqual(index.lookup("4567"), ["+380501234567"])
+        index.discard("Bob", "+380501234567")
+        self.assertIsNone(index.owner("+380501234567"))
+        self.assertEqual(index.lookup("4567"), [])
+
+    def test_other_owner_is_found_after_a_delete_or_edit(self):
+        path = self.write_file(saved_contact("Ann", "+380501234567"), saved_contact("Bob", "+380501234567"))
+        for lazy in (True, False):
+            book = self.load(path, lazy)
+            self.assertEqual([rec.name.value for _, rec in book.find_phone("0501234567")], ["Ann", "Bob"])
+            book.remove_record("Ann")
+            self.assertEqual([rec.name.value for _, rec in book.find_phone("4567")], ["Bob"])
+            book = self.load(path, lazy)
+            book.get("Bob").edit_phone(Phone("0507654321"))
+            self.assertEqual([rec.name.value for _, rec in book.find_phone("0501234567")], ["Ann"])
+
+    def test_sqlite_file_keeps_both_rows(self):
+        path = self.write_file(saved_contact("Ann", "+380501234567"), saved_contact("Bob", "+380501234567"))
+        storage = SqliteStorage(os.path.join(self.folder.name, "memo.db"))
+        self.addCleanup(storage.close)
+        book = SqliteAddressBook(storage)
+        book.load_from_file(path)
+        self.assertEqual([rec.name.value for _, rec in book.find_phone("4567")], ["Ann", "Bob"])
+        book.remove_record("Ann")
+        self.assertEqual([rec.name.value for _, rec in book.find_phone("0501234567")], ["Bob"])
+
+    def test_older_sqlite_file_is_migrated(self):
+        filename = os.path.join(self.folder.name, "memo.db")
+        db = sqlite3.connect(filename)
+        db.executescript(
+            """
+            CREATE TABLE phones (phone TEXT PRIMARY KEY, name TEXT NOT NULL, pos INTEGER NOT NULL, rev TEXT NOT NULL);
+            CREATE INDEX phones_name ON phones (name);
+            CREATE INDEX phones_rev ON phones (rev);
+            INSERT INTO phones VALUES ('+380501234567', 'Ann', 0, '765432105083+');
+            """
+        )
+        db.close()
+        storage = SqliteStorage(filename)
+        self.addCleanup(storage.close)
+        keys = [row[1] for row in storage.db.execute("PRAGMA table_info(phones)") if row[5]]
+        self.assertEqual(keys, ["phone", "name"])
+        self.assertEqual(SqliteAddressBook(storage).numbers.owners_of("+380501234567"), ["Ann"])
+
+
+class SearchTest(SavedFileTestCase):
+    def test_search_follows_the_changes(self):
+        path = self.write_file(
+            saved_contact("Ann Lee", "+380501234567", email="ann@mail.com"), saved_contact("Bob Lee", address="Kyiv")
+        )
+        for lazy in (True, False):
+            book = self.load(path, lazy)
+            self.assertEqual([rec.name.value for rec in book.search(" Lee")], ["Ann Lee", "Bob Lee"], lazy)
+            self.assertEqual([rec.name.value for rec in book.search("1234")], ["Ann Lee"])
+            self.assertEqual([rec.name.value for rec in book.search("Ky")], ["Bob Lee"])  # too short, a scan
+            book.get("Bob Lee").add_email(Email("bob@mail.com"))
+            self.assertEqual([rec.name.value for rec in book.search("mail.com")], ["Ann Lee", "Bob Lee"])
+            book.remove_record("Ann Lee")
+            self.assertEqual([rec.name.value for rec in book.search("mail.com")], ["Bob Lee"])
+            self.assertEqual(book.search("1234"), [])
+
+
+class BirthdaysWithinTest(unittest.TestCase):
+    def test_changed_birthday_moves_in_the_index(self):
+        today = date.today()
+        soon = today + timedelta(days=3)
+        book = AddressBook()
+        book.add_record(Record(Name("Ann"), birthday=Birthday(f"{today.day}.{today.month}.1988")))
+        book.add_record(Record(Name("Bob"), birthday=Birthday(f"{soon.day}.{soon.month}.1988")))
+        book.add_record(Record(Name("Cat")))
+        self.assertEqual([rec.name.value for rec in book.birthdays_within(0)], ["Ann"])
+        self.assertEqual([rec.name.value for rec in book.birthdays_within(3)], ["Ann", "Bob"])
+        book.get("Ann").change_birthday(Birthday(f"{soon.day}.{soon.month}.1992"))
+        self.assertEqual(book.birthdays_within(0), [])
+        self.assertEqual(sorted(rec.name.value for rec in book.birthdays_within(3)), ["Ann", "Bob"])
+
+
+if __name__ == "__main__":
+    unittest.main()
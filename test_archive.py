@@ -0,0 +1,93 @@
+"""archive of completed notes: python -m unittest test_archive"""
+from datetime import date, timedelta
+import os
+import tempfile
+import unittest
+
+from ab_classes import Note, NotePad
+from archive import NoteArchive
+from journal import Journal
+
+
+class ArchiveTestCase(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+        self.archive_file = os.path.join(self.folder, "note_archive.JSON")
+
+    def notepad(self) -> NotePad:
+        notebook = NotePad()
+        notebook.archive = NoteArchive(self.archive_file)
+        return notebook
+
+
+class NoteArchiveTest(ArchiveTestCase):
+    def notes(self, *texts) -> list:
+        notes = []
+        for i, text in enumerate(texts, 1):
+            note = Note(text)
+            note.id = i
+            notes.append(note)
+        return notes
+
+    def test_read_back_from_the_file(self):
+        NoteArchive(self.archive_file).add(self.notes("buy milk", "call mom"))
+        archive = NoteArchive(self.archive_file)
+        self.assertIsNone(archive.notes)  # nothing is read before it is asked for
+        self.assertEqual([note.text for note in archive.search("milk")], ["buy milk"])
+        self.assertEqual(sorted(archive.load()), [1, 2])
+
+    def test_taken_note_is_gone_after_a_reload(self):
+        archive = NoteArchive(self.archive_file)
+        archive.add(self.notes("buy milk", "call mom"))
+        self.assertEqual(archive.take(1).text, "buy milk")
+        self.assertIsNone(archive.take(1))
+        self.assertEqual(archive.search("milk"), [])
+        self.assertEqual(list(NoteArchive(self.archive_file).load()), [2])
+
+    def test_torn_last_line(self):
+        archive = NoteArchive(self.archive_file)
+        archive.add(self.notes("buy milk"))
+        with open(self.archive_file, "a") as dst:
+            dst.write('{"id": 2, "te')
+        self.assertEqual(list(NoteArchive(self.archive_file).load()), [1])
+
+
+class ArchiveDoneTest(ArchiveTestCase):
+    def test_old_done_notes_leave_the_working_set(self):
+        notebook = self.notepad()
+        for text in ("old", "recent", "open"):
+            notebook.add_note(Note(text))
+        notebook.change_status(notebook.get(1), date.today() - timedelta(days=40))
+        notebook.change_status(notebook.get(2), date.today() - timedelta(days=5))
+        self.assertEqual(notebook.archive_done(30), 1)
+        self.assertEqual([note.text for note in notebook.note_list], ["recent", "open"])
+        self.assertEqual([note.text for note in notebook.archived()], ["old"])
+        self.assertEqual([note.text for note in notebook.archived("ol")], ["old"])
+
+    def test_restore_survives_a_reload(self):
+        journal = Journal(os.path.join(self.folder, "note.JSON"), NotePad.fold_journal)
+        self.addCleanup(journal.close)
+        notebook = self.notepad()
+        journal.load(notebook)
+        notebook.add_note(Note("old"))
+        notebook.change_status(notebook.get(1), date.today() - timedelta(days=40))
+        notebook.archive_done(30)
+        journal.commit(notebook)
+        notebook.restore(notebook.archived()[0])
+        note = notebook.get(1)
+        self.assertEqual((note.text, note.done), ("old", False))
+        journal.commit(notebook)  # the archive copy is erased once the journal has the note
+        journal.close()
+        loaded = self.notepad()
+        reader = Journal(os.path.join(self.folder, "note.JSON"), NotePad.fold_journal)
+        reader.load(loaded)
+        reader.close()
+        self.assertEqual([note.id for note in loaded.note_list], [1])
+        self.assertEqual(loaded.archived(), [])
+        self.assertEqual(loaded.archive.load(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
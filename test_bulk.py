@@ -0,0 +1,138 @@
+"""import and export of contacts: python -m unittest test_bulk"""
+from datetime import datetime
+import csv
+import os
+import tempfile
+import unittest
+
+from ab_classes import Address, AddressBook, Birthday, Email, Name, Phone, Record
+import bulk
+
+
+class BulkTestCase(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.folder.name, name)
+
+    def write(self, name: str, text: str) -> str:
+        path = self.path(name)
+        with open(path, "w", newline="", encoding="utf-8") as dst:
+            dst.write(text)
+        return path
+
+
+class NormalizeManyTest(unittest.TestCase):
+    def test_same_values_as_one_by_one(self):
+        for cls, values in (
+            (Phone, ["050 123 45 67", "+380671234567", "123"]),
+            (Email, ["ann@mail.com", "ann"]),
+            (Address, ["Kyiv, Main 1", "Kyiv"]),
+            (Birthday, ["02.01.1990", "2/1/1990", "31.02.1990"]),
+            (Name, ["Ann", "1"]),
+        ):
+            normalized, errors = cls.normalize_many(values)
+            for value, result, error in zip(values, normalized, errors):
+                try:
+                    expected = cls.normalize(value)
+                except ValueError:
+                    self.assertIsNone(result, value)
+                    self.assertIsInstance(error, ValueError, value)
+                else:
+                    self.assertEqual(result, expected, value)
+                    self.assertIsNone(error, value)
+
+    def test_validate_batch(self):
+        batch = [
+            {"name": "Ann", "phones": ["0501234567", "0671234567"], "email": None, "address": None, "birthday": "02.01.1990"},
+            {"name": "Bob", "phones": ["0501234567", "12"], "email": None, "address": None, "birthday": None},
+            {"name": "Cat", "phones": [], "email": "cat", "address": None, "birthday": None},
+        ]
+        (ann, ann_error), (bob, bob_error), (cat, cat_error) = bulk.validate_batch(batch)
+        self.assertIsNone(ann_error)
+        self.assertEqual(ann["phones"], ["+380501234567", "+380671234567"])
+        self.assertEqual(ann["birthday"], datetime(1990, 1, 2))
+        self.assertIsNone(bob)
+        self.assertIsInstance(bob_error, ValueError)
+        self.assertIsNone(cat)
+        self.assertIsInstance(cat_error, ValueError)
+
+
+class ImportTest(BulkTestCase):
+    def test_csv_rows_and_rejects(self):
+        source = self.write(
+            "contacts.csv",
+            "name,phones,email,address,birthday\n"
+            "Ann Lee,050 123 45 67;0671234567,ann@mail.com,\"Kyiv, Main 1\",02.01.1990\n"
+            "Bob,123,,,\n"
+            "Cat,0501234567,,,\n"
+            "Ann Lee,0931112233,,,\n",
+        )
+        book = AddressBook()
+        commits = []
+        imported, rejected = bulk.import_contacts(book, source, self.path("rejected.csv"), lambda: commits.append(1))
+        self.assertEqual((imported, rejected), (1, 3))
+        self.assertEqual(commits, [1])
+        ann = book.get("Ann Lee")
+        self.assertEqual([phone.value for phone in ann.phones], ["+380501234567", "+380671234567"])
+        self.assertEqual(str(ann.birthday), "02.01.1990")
+        with open(self.path("rejected.csv"), newline="", encoding="utf-8") as rej:
+            rows = list(csv.reader(rej))
+        self.assertEqual([row[0] for row in rows[1:]], ["2", "3", "4"])  # bad number, taken number, same name
+        self.assertEqual(rows[2][2:4], ["Cat", "0501234567"])
+
+    def test_commit_after_every_batch(self):
+        rows = "".join(f"Person {i},050{i:07},,,\n" for i in range(5))
+        source = self.write("contacts.csv", "name,phones,email,address,birthday\n" + rows)
+        batch = bulk.BATCH
+        bulk.BATCH = 2
+        self.addCleanup(setattr, bulk, "BATCH", batch)
+        commits = []
+        book = AddressBook()
+        result = bulk.import_contacts(book, source, self.path("rejected.csv"), lambda: commits.append(len(book)))
+        self.assertEqual(result, (5, 0))
+        self.assertEqual(commits, [2, 4, 5])
+        self.assertFalse(os.path.exists(self.path("rejected.csv")))
+
+    def test_vcard(self):
+        source = self.write(
+            "contacts.vcf",
+            "BEGIN:VCARD\r\nVERSION:3.0\r\nFN:Ann\r\n  Lee\r\nitem1.TEL;TYPE=CELL:0501234567\r\n"
+            "ADR:;;Main 1\\, flat 2;Kyiv;;;\r\nBDAY:1990-01-02\r\nEND:VCARD\r\n",
+        )
+        book = AddressBook()
+        self.assertEqual(bulk.import_contacts(book, source, self.path("rejected.csv")), (1, 0))
+        ann = book.get("Ann Lee")
+        self.assertEqual(str(ann.phones[0]), "+380501234567")
+        self.assertEqual(ann.address.value, "Main 1, flat 2, Kyiv")
+        self.assertEqual(str(ann.birthday), "02.01.1990")
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            bulk.import_contacts(AddressBook(), self.path("contacts.txt"), self.path("rejected.csv"))
+
+
+class ExportTest(BulkTestCase):
+    def book(self) -> AddressBook:
+        book = AddressBook(lazy=True)
+        book.add_record(Record(Name("Ann; Lee"), Phone("0501234567"), birthday=Birthday("29.02.2000")))
+        book.get("Ann; Lee").add_phone(Phone("0671234567"))
+        book.add_record(Record(Name("Bob")))
+        return book
+
+    def test_round_trip(self):
+        for name in ("contacts.csv", "contacts.vcf"):
+            path = self.path(name)
+            self.assertEqual(bulk.export_contacts(self.book(), path), 2)
+            loaded = AddressBook()
+            self.assertEqual(bulk.import_contacts(loaded, path, self.path("rejected.csv")), (2, 0), name)
+            self.assertEqual(sorted(loaded), ["Ann; Lee", "Bob"])
+            ann = loaded.get("Ann; Lee")
+            self.assertEqual([phone.value for phone in ann.phones], ["+380501234567", "+380671234567"], name)
+            self.assertEqual(str(ann.birthday), "29.02.2000")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+"""round trips of the saved dates: python -m unittest test_dates"""
+from datetime import date, datetime
+import json
+import os
+import tempfile
+import unittest
+
+from ab_classes import AddressBook, Birthday, Name, Note, NotePad, Phone, Record, date_code, parse_date
+
+
+class ParseDateTest(unittest.TestCase):
+    def test_ordinal(self):
+        day = datetime(1990, 1, 2)
+        self.assertEqual(parse_date(date_code(day)), day)
+        self.assertEqual(parse_date(1), datetime(1, 1, 1))
+
+    def test_digit_string(self):
+        self.assertEqual(parse_date(str(date_code(date(2024, 2, 29)))), datetime(2024, 2, 29))
+
+    def test_dotted(self):
+        self.assertEqual(parse_date("02.01.1990"), datetime(1990, 1, 2))
+
+    def test_iso(self):
+        self.assertEqual(parse_date("1990-01-02"), datetime(1990, 1, 2))
+        self.assertEqual(parse_date("1990-01-02 13:45:10.123456"), datetime(1990, 1, 2))
+
+    def test_every_layout_gives_the_same_day(self):
+        for day in (date(1, 1, 1), date(1999, 12, 31), date(2000, 2, 29), date(9999, 12, 31)):
+            expected = datetime(day.year, day.month, day.day)
+            for value in (
+                date_code(day),
+                str(date_code(day)),
+                day.strftime("%d.%m.") + f"{day.year:04}",
+                f"{day.year:04}" + day.strftime("-%m-%d"),
+            ):
+                self.assertEqual(parse_date(value), expected, value)
+
+
+class BirthdayTest(unittest.TestCase):
+    def test_user_layouts(self):
+        self.assertEqual(Birthday("02.01.1990").value, datetime(1990, 1, 2))
+        self.assertEqual(Birthday("2/1/1990").value, datetime(1990, 1, 2))
+
+    def test_rejects_saved_layouts(self):
+        for value in ("1990-01-02", "1990-01-02 junk", "726469", "31.02.1990", "02.01.1990 junk"):
+            with self.assertRaises(ValueError, msg=value):
+                Birthday(value)
+
+    def test_trusted_saved_values(self):
+        self.assertEqual(Birthday.trusted(726469).value, datetime.fromordinal(726469))
+        self.assertEqual(Birthday.trusted("1990-01-02").value, datetime(1990, 1, 2))
+
+
+class NoteRoundTripTest(unittest.TestCase):
+    def test_round_trip(self):
+        note = Note("buy milk")
+        note.id = 7
+        note.done = True
+        note.done_date = date(2024, 3, 1)
+        data = note.to_dict()
+        self.assertIsInstance(data["day"], int)
+        self.assertEqual(data["done_date"], date(2024, 3, 1).toordinal())
+        loaded = Note("")
+        loaded.from_dict(data)
+        self.assertEqual(loaded.day, datetime(note.day.year, note.day.month, note.day.day))
+        self.assertEqual(loaded.done_date, note.done_date)
+        self.assertEqual((loaded.id, loaded.text, loaded.done), (7, "buy milk", True))
+
+    def test_legacy_strings(self):
+        loaded = Note("")
+        loaded.from_dict(
+            {"day": "2023-05-06 10:11:12.000001", "done": True, "done_date": "07.05.2023", "text": "x", "tag_list": []}
+        )
+        self.assertEqual(loaded.day, datetime(2023, 5, 6))
+        self.assertEqual(loaded.done_date, date(2023, 5, 7))
+
+    def test_notepad_file(self):
+        notebook = NotePad()
+        note = Note("call mom")
+        notebook.add_note(note)
+        notebook.change_status(note, date(2024, 1, 5))
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "note.JSON")
+            notebook.save_to_file(path)
+            loaded = NotePad()
+            loaded.load_from_file(path)
+        (copy,) = list(loaded.note_list)
+        self.assertEqual(copy.done_date, date(2024, 1, 5))
+        self.assertEqual(copy.day.date(), note.day.date())
+
+
+class AddressBookRoundTripTest(unittest.TestCase):
+    def round_trip(self, lazy: bool) -> Record:
+        book = AddressBook(lazy=lazy)
+        book.add_record(Record(Name("Ann Lee"), Phone("0501234567"), birthday=Birthday("29.02.2000")))
+        book.add_record(Record(Name("Bob")))
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "phonebook.JSON")
+            book.save_to_file(path)
+            loaded = AddressBook(lazy=lazy)
+            loaded.load_from_file(path)
+        self.assertIsNone(loaded.get("Bob").birthday)
+        return loaded.get("Ann Lee")
+
+    def test_lazy(self):
+        record = self.round_trip(lazy=True)
+        self.assertEqual(record.birthday.value, datetime(2000, 2, 29))
+        self.assertEqual(str(record.birthday), "29.02.2000")
+
+    def test_eager(self):
+        record = self.round_trip(lazy=False)
+        self.assertEqual(record.birthday.value, datetime(2000, 2, 29))
+
+    def test_legacy_file(self):
+        saved = {
+            name: {"name": name, "phones": [], "email": None, "address": None, "birthday": birthday}
+            for name, birthday in (("Ann", "29.02.2000"), ("Bob", "2000-02-29 00:00:00"))
+        }
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "phonebook.JSON")
+            with open(path, "w") as db:
+                json.dump(saved, db)
+            for lazy in (True, False):
+                book = AddressBook(lazy=lazy)
+                book.load_from_file(path)
+                for name in saved:
+                    self.assertEqual(book.get(name).birthday.value, datetime(2000, 2, 29), (lazy, name))
+
+
+if __name__ == "__main__":
+    unittest.main()
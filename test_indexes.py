@@ -0,0 +1,244 @@
+"""indexes of AddressBook and NotePad: python -m unittest test_indexes"""
+from datetime import date
+import unittest
+
+from indexes import (
+    BKTree,
+    BirthdayIndex,
+    NameIndex,
+    PhoneIndex,
+    PrefixTrie,
+    RankedList,
+    TextIndex,
+    TrigramIndex,
+    levenshtein,
+)
+
+
+class TrigramIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = TrigramIndex()
+        self.index.add("Ann", ["Ann Lee", "+380501234567"])
+        self.index.add("Bob", ["Bob Lee", "bob@mail.com"])
+
+    def test_candidates_have_every_trigram(self):
+        self.assertEqual(self.index.candidates(" Lee"), {"Ann", "Bob"})
+        self.assertEqual(self.index.candidates("mail"), {"Bob"})
+        self.assertEqual(self.index.candidates("Ann Lee"), {"Ann"})
+        self.assertEqual(self.index.candidates("xyz"), set())
+
+    def test_short_pattern_needs_a_scan(self):
+        self.assertIsNone(self.index.candidates("Le"))
+
+    def test_discard_drops_empty_postings(self):
+        self.index.discard("Bob", ["Bob Lee", "bob@mail.com"])
+        self.assertEqual(self.index.candidates(" Lee"), {"Ann"})
+        self.assertNotIn("mai", self.index.index)
+
+
+class BirthdayIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = BirthdayIndex()
+        for key, born in (("Ann", date(1990, 12, 30)), ("Bob", date(1985, 1, 2)), ("Cat", date(2000, 2, 29))):
+            self.index.add(key, born)
+
+    def test_window_in_date_order_over_the_new_year(self):
+        self.assertEqual(self.index.window(date(2023, 12, 29), 5), ["Ann", "Bob"])
+        self.assertEqual(self.index.window(date(2023, 12, 31), 1), [])
+
+    def test_leap_day_in_a_common_year(self):
+        self.assertEqual(self.index.window(date(2023, 3, 1), 0), ["Cat"])
+        self.assertEqual(self.index.window(date(2024, 3, 1), 0), [])
+        self.assertEqual(self.index.window(date(2024, 2, 28), 1), ["Cat"])
+
+    def test_whole_year(self):
+        self.assertEqual(self.index.window(date(2023, 6, 1), 365), ["Ann", "Bob", "Cat"])
+        self.assertEqual(self.index.window(date(2023, 6, 1), -1), [])
+
+    def test_discard(self):
+        self.index.discard("Bob", date(1985, 1, 2))
+        self.assertEqual(self.index.window(date(2023, 12, 29), 5), ["Ann"])
+        self.assertNotIn(102, self.index.days)
+
+
+class PhoneIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = PhoneIndex()
+        self.index.add("Ann", "+380501234567")
+        self.index.add("Bob", "+380671234567")
+        self.index.add("Cat", "+380509999999")
+
+    def test_suffix_lookup(self):
+        self.assertEqual(self.index.lookup("4567"), ["+380501234567", "+380671234567"])
+        self.assertEqual(self.index.lookup("1234567"), ["+380501234567", "+380671234567"])
+        self.assertEqual(self.index.lookup("501234567"), ["+380501234567"])  # longer than the kept suffixes
+        self.assertEqual(self.index.lookup("567"), [])  # too short
+
+    def test_owner(self):
+        self.assertEqual(self.index.owner("+380671234567"), "Bob")
+        self.assertIsNone(self.index.owner("+380000000000"))
+
+
+class LevenshteinTest(unittest.TestCase):
+    def reference(self, a: str, b: str) -> int:
+        row = list(range(len(b) + 1))
+        for i, x in enumerate(a, 1):
+            prev, row[0] = row[0], i
+            for j, y in enumerate(b, 1):
+                prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (x != y))
+        return row[-1]
+
+    def test_matches_the_table_method(self):
+        words = ["", "a", "ann", "anna", "hanna", "olena", "olexandr", "oleksandr", "oleksandra", "ганна"]
+        for a in words:
+            distance = levenshtein(a)
+            for b in words:
+                self.assertEqual(distance(b), self.reference(a, b), (a, b))
+
+
+class BKTreeTest(unittest.TestCase):
+    def test_search_within_limit(self):
+        tree = BKTree()
+        for word in ("anna", "hanna", "ann", "bob", "bobby", "anna"):
+            tree.add(word)
+        self.assertEqual(sorted(tree.search("ana", 1)), [(1, "ann"), (1, "anna")])
+        self.assertEqual(sorted(tree.search("bob", 0)), [(0, "bob")])
+        self.assertEqual(BKTree().search("bob", 2), [])
+
+
+class NameIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = NameIndex()
+        for key in ("Anna Lee", "Hanna Smith", "Oleksandr Ivanenko", "Bob Ray"):
+            self.index.add(key)
+
+    def test_typos(self):
+        self.assertEqual(self.index.closest("Ana")[:1], ["Anna Lee"])
+        self.assertEqual(self.index.closest("Oleksander"), ["Oleksandr Ivanenko"])
+        self.assertEqual(self.index.closest("smiht hana"), ["Hanna Smith"])
+
+    def test_spelling_in_cyrillic(self):
+        self.assertEqual(self.index.closest("Олександр"), ["Oleksandr Ivanenko"])
+
+    def test_discarded_names_are_not_found(self):
+        self.index.discard("Bob Ray")
+        self.assertEqual(self.index.closest("Bob"), [])
+        self.index.add("Bob Ray")
+        self.assertEqual(self.index.closest("Bob"), ["Bob Ray"])
+
+
+class PrefixTrieTest(unittest.TestCase):
+    def setUp(self):
+        self.words = ["add", "add contact", "add note", "address", "b", "bob", "bobby"]
+        self.trie = PrefixTrie(reversed(self.words))
+
+    def test_complete_in_sorted_order(self):
+        self.assertEqual(self.trie.complete(""), self.words)
+        self.assertEqual(self.trie.complete("add "), ["add contact", "add note"])
+        self.assertEqual(self.trie.complete("bo", 1), ["bob"])
+        self.assertEqual(self.trie.complete("bobz"), [])
+        self.assertEqual(self.trie.complete("address book"), [])
+
+    def test_longest_prefix_ends_at_a_separator(self):
+        self.assertEqual(self.trie.longest_prefix("add note milk"), "add note")
+        self.assertEqual(self.trie.longest_prefix("add notes"), "add")
+        self.assertEqual(self.trie.longest_prefix("addition"), None)
+        self.assertEqual(self.trie.longest_prefix("bob"), "bob")
+
+    def test_discard_collapses_the_branches(self):
+        for word in self.words:
+            self.trie.add(word)
+        self.assertEqual(len(self.trie), len(self.words))
+        for word in self.words[:-1]:
+            self.trie.discard(word)
+        self.trie.discard("missing")
+        self.assertEqual(len(self.trie), 1)
+        self.assertEqual(self.trie.root, {"b": "bobby"})
+        self.assertEqual(self.trie.complete("b"), ["bobby"])
+
+
+class TextIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = TextIndex()
+        self.index.add(1, "Buy milk and bread")
+        self.index.add(2, "milk milk milk for the cat")
+        self.index.add(3, "Call mom about the bread recipe, it’s Mom's")
+        self.index.add(4, "bread")
+
+    def test_every_word_best_first(self):
+        self.assertEqual(self.index.search("milk "), [2, 1])
+        self.assertEqual(self.index.search("bread milk "), [1])
+        self.assertEqual(self.index.search("bread "), [4, 1, 3])  # the shortest note first
+        self.assertEqual(self.index.search("milk tea "), [])
+
+    def test_last_word_may_be_unfinished(self):
+        self.assertEqual(sorted(self.index.search("bre")), [1, 3, 4])
+        self.assertEqual(self.index.search("mo"), [3])
+        self.assertEqual(self.index.search("bread mi"), [1])
+
+    def test_phrase(self):
+        self.assertEqual(self.index.search('"milk and"'), [1])
+        self.assertEqual(self.index.search('"and milk"'), [])
+        self.assertEqual(self.index.search('"the bread'), [3])  # closing quote is optional
+
+    def test_apostrophes_and_case(self):
+        self.assertEqual(self.index.search("IT'S "), [3])
+        self.assertEqual(self.index.search("mom's"), [3])
+
+    def test_no_words(self):
+        self.assertIsNone(self.index.search("..."))
+
+    def test_discard(self):
+        self.index.discard(4, "bread")
+        self.index.discard(4, "bread")
+        self.assertEqual(sorted(self.index.search("bread ")), [1, 3])
+        self.index.discard(2, "milk milk milk for the cat")
+        self.assertNotIn("cat", self.index.vocabulary)
+        self.assertEqual(self.index.total, sum(self.index.lengths.values()))
+
+
+class Ranked:
+    def __init__(self, name: str, rank: int):
+        self.name = name
+        self.rank = rank
+
+
+class RankedListTest(unittest.TestCase):
+    def setUp(self):
+        self.by_name = {name: Ranked(name, rank) for name, rank in (("a", 0), ("b", 2), ("c", 1), ("d", 2), ("e", 0))}
+        self.items = RankedList(lambda item: item.rank, self.by_name.values())
+
+    def names(self, items) -> list:
+        return [item.name for item in items]
+
+    def test_rank_then_insertion_order(self):
+        self.assertEqual(self.names(self.items), ["b", "d", "c", "a", "e"])
+        self.assertEqual(len(self.items), 5)
+        self.assertIn(self.by_name["c"], self.items)
+        self.assertNotIn(Ranked("c", 1), self.items)  # kept by identity
+
+    def test_move_after_a_rank_change(self):
+        self.by_name["e"].rank = 2
+        self.items.move(self.by_name["e"])
+        self.assertEqual(self.names(self.items), ["b", "d", "e", "c", "a"])
+
+    def test_remove(self):
+        self.items.remove(self.by_name["c"])
+        self.assertEqual(self.names(self.items), ["b", "d", "a", "e"])
+        self.assertNotIn(self.by_name["c"], self.items)
+        self.assertEqual(self.items.ranks, [0, 2])
+
+    def test_indexing_and_slices(self):
+        expected = list(self.items)
+        for i in range(-5, 5):
+            self.assertIs(self.items[i], expected[i])
+        for start in range(6):
+            for stop in range(6):
+                self.assertEqual(self.items[start:stop], expected[start:stop], (start, stop))
+        self.assertEqual(self.items[::-2], expected[::-2])
+        with self.assertRaises(IndexError):
+            self.items[5]
+
+
+if __name__ == "__main__":
+    unittest.main()
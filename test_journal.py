@@ -0,0 +1,275 @@
+"""journal persistence and background autosave: python -m unittest test_journal"""
+from threading import Lock, Thread
+from unittest import mock
+from datetime import date
+import csv
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from ab_classes import AddressBook, Console, HashTag, Name, Note, NotePad, Phone, Record
+from journal import Autosave, Journal
+import bulk
+
+
+class JournalTestCase(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.folder.name, name)
+
+    def book_journal(self, limit: int = 1048576) -> Journal:
+        journal = Journal(self.path("phonebook.JSON"), AddressBook.fold_journal, limit)
+        self.addCleanup(journal.close)
+        return journal
+
+    def reload_book(self) -> AddressBook:
+        book = AddressBook(lazy=True)
+        journal = Journal(self.path("phonebook.JSON"), AddressBook.fold_journal)
+        journal.load(book)
+        journal.close()
+        return book
+
+
+class ReplayTest(JournalTestCase):
+    def test_changes_come_back_from_the_journal(self):
+        book = AddressBook(lazy=True)
+        journal = self.book_journal()
+        journal.load(book)
+        book.add_record(Record(Name("Ann Lee"), Phone("0501234567")))
+        book.add_record(Record(Name("Bob Ray")))
+        journal.commit(book)
+        book.remove_record("Bob Ray")
+        book.get("Ann Lee").edit_phone(Phone("0671234567"))
+        journal.commit(book)
+        journal.close()
+        self.assertFalse(os.path.exists(self.path("phonebook.JSON")))  # below the limit, no snapshot yet
+        loaded = self.reload_book()
+        self.assertEqual(list(loaded), ["Ann Lee"])
+        self.assertEqual(str(loaded.get("Ann Lee").phones[0]), "+380671234567")
+        self.assertEqual(loaded.numbers.owners_of("+380501234567"), [])
+
+    def test_torn_last_entry_is_skipped(self):
+        book = AddressBook(lazy=True)
+        journal = self.book_journal()
+        journal.load(book)
+        book.add_record(Record(Name("Ann Lee")))
+        journal.commit(book)
+        journal.file.write(b'["put",{"name":"Bob')
+        journal.close()
+        self.assertEqual(list(self.reload_book()), ["Ann Lee"])
+
+    def test_journal_left_by_an_interrupted_fold(self):
+        notebook = NotePad()
+        journal = Journal(self.path("note.JSON"), NotePad.fold_journal)
+        journal.load(notebook)
+        notebook.add_note(Note("one"))
+        journal.commit(notebook)
+        journal.close()
+        os.replace(journal.path, journal.old_path)
+        loaded = NotePad()
+        reader = Journal(self.path("note.JSON"), NotePad.fold_journal)
+        reader.load(loaded)  # replays it and folds it again
+        reader.close()
+        self.assertEqual([note.text for note in loaded.note_list], ["one"])
+        self.assertFalse(os.path.exists(journal.old_path))
+        with open(self.path("note.JSON")) as db:
+            self.assertEqual([note["text"] for note in json.load(db)["notes"]], ["one"])
+
+
+class AutosaveTest(JournalTestCase):
+    def test_stop_writes_the_last_changes(self):
+        book = AddressBook(lazy=True)
+        journal = self.book_journal()
+        journal.load(book)
+        saver = Autosave([(journal, book)], Lock(), interval=60, changes=50)
+        saver.start()
+        book.add_record(Record(Name("Ann Lee")))
+        saver.touch()  # below the threshold, waits for the interval
+        self.assertEqual(journal.file.tell(), 0)
+        saver.stop()
+        self.assertFalse(saver.is_alive())
+        self.assertEqual(list(self.reload_book()), ["Ann Lee"])
+
+    def test_enough_changes_wake_it_up(self):
+        book = AddressBook(lazy=True)
+        journal = self.book_journal()
+        journal.load(book)
+        saver = Autosave([(journal, book)], Lock(), interval=60, changes=2)
+        saver.start()
+        self.addCleanup(saver.stop)
+        book.add_record(Record(Name("Ann Lee")))
+        book.add_record(Record(Name("Bob Ray")))
+        saver.touch()
+        for _ in range(500):
+            if saver.saved[0] == book.generation:
+                break
+            time.sleep(0.01)
+        self.assertEqual(sorted(self.reload_book()), ["Ann Lee", "Bob Ray"])
+
+    def test_failed_checkpoint_is_reported_and_tried_again(self):
+        book = AddressBook(lazy=True)
+        journal = self.book_journal()
+        journal.load(book)
+        saver = Autosave([(journal, book)], Lock())
+        write = journal.write
+
+        def full_disk(data):
+            journal.write = write
+            raise OSError("disk full")
+
+        journal.write = full_disk
+        book.add_record(Record(Name("Ann Lee")))
+        saver.checkpoint()
+        self.assertIsInstance(saver.take_error(), OSError)
+        self.assertIsNone(saver.take_error())
+        self.assertEqual(saver.pending(), 1)
+        saver.checkpoint()
+        self.assertEqual(saver.pending(), 0)
+        self.assertEqual(list(self.reload_book()), ["Ann Lee"])
+
+
+class AutosaveImportTest(JournalTestCase):
+    def test_import_commits_while_autosave_runs(self):
+        # import contacts commits inline while its command holds the data lock
+        source = self.path("contacts.csv")
+        with open(source, "w", newline="", encoding="utf-8") as dst:
+            writer = csv.DictWriter(dst, bulk.FIELDS)
+            writer.writeheader()
+            for i in range(3000):
+                writer.writerow({"name": f"Person {i}", "phones": f"050{i:07}"})
+        book = AddressBook(lazy=True)
+        journal = self.book_journal()
+        journal.load(book)
+        data_lock = Lock()
+        saver = Autosave([(journal, book)], data_lock, interval=0.001, changes=1)
+        saver.start()
+        batch = bulk.BATCH
+        bulk.BATCH = 50
+        self.addCleanup(setattr, bulk, "BATCH", batch)
+
+        def command():
+            with data_lock:
+                bulk.import_contacts(book, source, self.path("rejected.csv"), lambda: journal.commit(book))
+                saver.touch()
+
+        worker = Thread(target=command, daemon=True)
+        worker.start()
+        worker.join(30)
+        self.assertFalse(worker.is_alive(), "import and autosave deadlocked")
+        saver.stop()
+        self.assertIsNone(saver.error)
+        self.assertEqual(len(self.reload_book()), 3000)
+
+
+class PromptTest(JournalTestCase):
+    def test_autosave_commits_while_a_prompt_waits(self):
+        book = AddressBook(lazy=True)
+        journal = self.book_journal()
+        journal.load(book)
+        data_lock = Lock()
+        committed = []
+
+        def typing(prompt):
+            book.add_record(Record(Name("Ann Lee")))
+            saver = Thread(target=journal.commit, args=(book, data_lock), daemon=True)
+            saver.start()
+            saver.join(5)
+            committed.append(not saver.is_alive())
+            return "y"
+
+        with data_lock, mock.patch("builtins.input", typing):
+            Console.data_lock = data_lock
+            try:
+                self.assertEqual(Console.user_input("Are you sure? "), "y")
+                self.assertTrue(data_lock.locked())  # the command has it back
+            finally:
+                Console.data_lock = None
+        self.assertEqual(committed, [True])
+        self.assertIn("Ann Lee", self.reload_book())
+
+
+class FailedWriteTest(JournalTestCase):
+    def test_entries_of_a_failed_write_go_first_next_time(self):
+        notebook = NotePad()
+        journal = Journal(self.path("note.JSON"), NotePad.fold_journal)
+        self.addCleanup(journal.close)
+        journal.load(notebook)
+        write = journal.write
+
+        def full_disk(data):
+            journal.write = write
+            raise OSError("disk full")
+
+        journal.write = full_disk
+        notebook.add_note(Note("one"))
+        with self.assertRaises(OSError):
+            journal.commit(notebook)
+        notebook.add_note(Note("two"))
+        journal.commit(notebook)
+        loaded = NotePad()
+        reader = Journal(self.path("note.JSON"), NotePad.fold_journal)
+        reader.load(loaded)
+        reader.close()
+        self.assertEqual([note.text for note in loaded.note_list], ["one", "two"])
+
+
+class FoldTest(JournalTestCase):
+    def test_book_snapshot_matches_the_replay(self):
+        book = AddressBook(lazy=True)
+        journal = self.book_journal(limit=1)
+        journal.load(book)
+        for i, name in enumerate(("Ann Lee", "Bob Ray", "Cat Sun")):
+            book.add_record(Record(Name(name), Phone(f"050123456{i}")))
+        journal.commit(book)
+        journal.worker.join()
+        book.get("Bob Ray").edit_phone(Phone("0991234567"))
+        book.remove_record("Cat Sun")
+        journal.commit(book)
+        journal.close()
+        self.assertFalse(os.path.exists(journal.old_path))
+        with open(self.path("phonebook.JSON")) as db:
+            saved = json.load(db)
+        self.assertEqual(saved, {key: book.data.raw(key) for key in book.data})
+
+    def test_note_snapshot_matches_the_replay(self):
+        notebook = NotePad()
+        journal = Journal(self.path("note.JSON"), NotePad.fold_journal, limit=1)
+        self.addCleanup(journal.close)
+        journal.load(notebook)
+        for text in ("one", "two", "three"):
+            notebook.add_note(Note(text))
+        journal.commit(notebook)
+        journal.worker.join()
+        one, two, three = sorted(notebook.note_list, key=lambda note: note.id)
+        notebook.add_tag(one, HashTag("home"))
+        notebook.change_note(two, "second")
+        notebook.change_status(two, date(2024, 1, 5))
+        notebook.delete(three)
+        journal.commit(notebook)
+        journal.worker.join()
+        loaded = NotePad()
+        loaded.load_from_file(self.path("note.JSON"))
+        self.assertEqual([note.to_dict() for note in loaded.note_list], [note.to_dict() for note in notebook.note_list])
+        self.assertEqual((loaded.journal_seq, loaded.next_id), (notebook.journal_seq, notebook.next_id))
+
+    def test_legacy_notes_get_the_ids_of_the_loaded_notepad(self):
+        with open(self.path("note.JSON"), "w") as db:
+            json.dump({"notes": [Note("plain").to_dict() | {"id": None}, Note("tagged", HashTag("a")).to_dict() | {"id": None}]}, db)
+        notebook = NotePad()
+        journal = Journal(self.path("note.JSON"), NotePad.fold_journal, limit=1)
+        self.addCleanup(journal.close)
+        journal.load(notebook)
+        notebook.change_note(notebook.find("plain"), "changed")
+        journal.commit(notebook)
+        journal.worker.join()
+        loaded = NotePad()
+        loaded.load_from_file(self.path("note.JSON"))
+        self.assertEqual(
+            sorted((note.id, note.text) for note in loaded.note_list),
+            sorted((note.id, note.text) for note in notebook.note_list),
+        )
@@ -0,0 +1,95 @@
+"""command line of main.py: python -m unittest test_main"""
+from contextlib import redirect_stdout
+from unittest import mock
+import io
+import os
+import tempfile
+import unittest
+
+from ab_classes import AddressBook, Console, NotePad
+from journal import Journal
+import main
+
+
+class CommandParserTest(unittest.TestCase):
+    def test_longest_command_wins(self):
+        self.assertEqual(main.command_parser("add   contact Ann  Lee"), (main.add_contact, ["Ann", "Lee"]))
+        self.assertEqual(main.command_parser("ADD NOTE buy milk"), (main.add_note, ["buy", "milk"]))
+        self.assertEqual(main.command_parser("phone Ann"), (main.phone, ["Ann"]))
+
+    def test_unknown_command(self):
+        self.assertEqual(main.command_parser("phones Ann")[0], main.no_command)
+        self.assertEqual(main.command_parser("")[0], main.no_command)
+
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+        for name, value in (("book_storage", self.journal("phonebook.JSON")), ("note_storage", self.journal("note.JSON"))):
+            patch = mock.patch.object(main, name, value, create=True)
+            patch.start()
+            self.addCleanup(patch.stop)
+        patch = mock.patch.object(main, "PAGE", 10, create=True)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def journal(self, name: str) -> Journal:
+        fold = NotePad.fold_journal if name == "note.JSON" else AddressBook.fold_journal
+        return Journal(os.path.join(self.folder, name), fold)
+
+    def run_batch(self, lines, stop=False) -> tuple:
+        out = io.StringIO()
+        with redirect_stdout(out):
+            failed = main.run_batch(AddressBook(lazy=True), NotePad(), lines, stop)
+        return failed, out.getvalue().splitlines()
+
+    def test_script_with_answers(self):
+        failed, lines = self.run_batch(
+            [
+                "# contacts",
+                "",
+                "add contact Ann 0501234567",
+                "add contact Bob",
+                "del contact Bob | n | y",
+                "del contact Ann",
+                "frobnicate",
+                "add note buy milk",
+            ]
+        )
+        self.assertEqual(failed, 2)
+        marks = [line for line in lines if line.startswith("[")]
+        self.assertEqual(
+            marks,
+            [
+                "[ok] 3: add contact Ann 0501234567",
+                "[ok] 4: add contact Bob",
+                "[ok] 5: del contact Bob | n | y",
+                "[error] 6: del contact Ann",
+                "[error] 7: frobnicate",
+                "[ok] 8: add note buy milk",
+            ],
+        )
+        self.assertIn("no answer for the question: Are you sure you want to delete Ann? (Y/N)", lines)
+        self.assertEqual(lines[-1], "Commands: 6, failed: 2")
+        self.assertIsNone(Console.answers)
+
+    def test_changes_are_saved_at_the_end(self):
+        self.run_batch(["add contact Ann 0501234567", "add note buy milk"])
+        book, notebook = AddressBook(lazy=True), NotePad()
+        for store, name in ((book, "phonebook.JSON"), (notebook, "note.JSON")):
+            journal = self.journal(name)
+            journal.load(store)
+            journal.close()
+        self.assertEqual(list(book), ["Ann"])
+        self.assertEqual([note.text for note in notebook.note_list], ["buy milk"])
+
+    def test_stop_at_the_first_error(self):
+        failed, lines = self.run_batch(["frobnicate", "add contact Ann"], stop=True)
+        self.assertEqual(failed, 1)
+        self.assertEqual(lines[-1], "Commands: 1, failed: 1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+"""NotePad tags, lookups and note selection: python -m unittest test_notepad"""
+from collections import deque
+from contextlib import redirect_stdout
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from ab_classes import Console, HashTag, Note, NotePad
+import notebook
+
+
+def tagged_notes(*notes) -> NotePad:
+    # (text, tag) pairs
+    pad = NotePad()
+    for text, tag in notes:
+        pad.add_note(Note(text, HashTag(tag)))
+    return pad
+
+
+class TagLookupTest(unittest.TestCase):
+    def setUp(self):
+        self.pad = tagged_notes(("milk", "home"), ("essay", "homework"), ("report", "work"))
+
+    def test_with_tag_is_exact(self):
+        self.assertEqual([note.text for note in self.pad.with_tag("#home")], ["milk"])
+        self.assertEqual([note.text for note in self.pad.with_tag("home")], ["milk"])
+        self.assertEqual(self.pad.with_tag("#hom"), [])
+
+    def test_tagged_is_a_prefix(self):
+        self.assertEqual(sorted(note.text for note in self.pad.tagged("#hom")), ["essay", "milk"])
+
+    def choose(self, text: str, answer: str = "1"):
+        Console.answers = deque([answer])
+        self.addCleanup(setattr, Console, "answers", None)
+        out = io.StringIO()
+        with redirect_stdout(out):
+            note = notebook.select_note(self.pad, text)
+        return note, out.getvalue()
+
+    def test_select_note_by_a_whole_tag(self):
+        note, shown = self.choose("#home")
+        self.assertEqual(note.text, "milk")
+        self.assertNotIn("essay", shown)
+
+    def test_select_note_by_an_unfinished_tag(self):
+        note, _ = self.choose("#homew")
+        self.assertEqual(note.text, "essay")
+        _, shown = self.choose("#ho")
+        self.assertIn("milk", shown)
+        self.assertIn("essay", shown)
+
+    def test_deleted_note_leaves_the_tag(self):
+        self.pad.delete(self.pad.with_tag("#home")[0])
+        self.assertEqual(self.pad.with_tag("#home"), [])
+        self.assertNotIn("#home", self.pad.vocabulary)
+
+
+class TagPoolTest(unittest.TestCase):
+    def test_notes_share_one_tag_object(self):
+        pad = tagged_notes(("one", "home"), ("two", "#home"), ("three", "work"))
+        one, two = pad.find("one"), pad.find("two")
+        self.assertIs(one.tag_list[0], two.tag_list[0])
+        self.assertEqual([(str(tag), uses) for tag, uses in pad.tag_pool.counts()], [("#home", 2), ("#work", 1)])
+
+    def test_unused_tag_leaves_the_pool(self):
+        pad = tagged_notes(("one", "home"), ("two", "work"))
+        pad.delete(pad.find("two"))
+        self.assertNotIn("#work", pad.tag_pool.tags)
+        pad.add_tag(pad.find("one"), HashTag("home"))  # already there, not counted twice
+        self.assertEqual([(str(tag), uses) for tag, uses in pad.tag_pool.counts()], [("#home", 1)])
+
+    def test_loaded_notes_share_tags(self):
+        pad = tagged_notes(("one", "home"), ("two", "home"))
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "note.JSON")
+            pad.save_to_file(path)
+            loaded = NotePad()
+            loaded.load_from_file(path)
+        one, two = loaded.find("one"), loaded.find("two")
+        self.assertIs(one.tag_list[0], two.tag_list[0])
+        self.assertEqual(one.tag_list[0].uses, 2)
+
+
+class NoteOrderTest(unittest.TestCase):
+    def test_most_tagged_first(self):
+        pad = tagged_notes(("one", "a"), ("two", "b"), ("three", "c"))
+        pad.add_note(Note("plain"))
+        pad.add_tag(pad.find("three"), HashTag("d"))
+        self.assertEqual([note.text for note in pad.note_list], ["three", "one", "two", "plain"])
+        pad.add_tag(pad.find("one"), HashTag("e"))
+        self.assertEqual([note.text for note in pad.note_list], ["three", "one", "two", "plain"])
+        pad.delete(pad.find("three"))
+        self.assertEqual([note.text for note in pad.note_list[:2]], ["one", "two"])
+
+
+class NoteIdTest(unittest.TestCase):
+    def test_ids_are_not_reused(self):
+        pad = NotePad()
+        for text in ("one", "two", "three"):
+            pad.add_note(Note(text))
+        self.assertEqual([pad.get(i).text for i in (1, 2, 3)], ["one", "two", "three"])
+        pad.delete(pad.get(3))
+        pad.add_note(Note("four"))
+        self.assertIsNone(pad.get(3))
+        self.assertEqual(pad.get(4).text, "four")
+
+    def test_ids_survive_a_reload(self):
+        pad = NotePad()
+        for text in ("one", "two", "three"):
+            pad.add_note(Note(text))
+        pad.delete(pad.get(3))
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "note.JSON")
+            pad.save_to_file(path)
+            loaded = NotePad()
+            loaded.load_from_file(path)
+        self.assertEqual((loaded.get(2).text, loaded.next_id), ("two", 4))
+
+    def test_notes_saved_before_ids(self):
+        notes = [{key: value for key, value in Note(text).to_dict().items() if key != "id"} for text in ("one", "two")]
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "note.JSON")
+            with open(path, "w") as db:
+                json.dump({"notes": notes}, db)
+            pad = NotePad()
+            pad.load_from_file(path)
+        self.assertEqual(sorted(pad.by_id), [1, 2])
+        self.assertEqual(pad.next_id, 3)
+
+    def test_select_note_by_id(self):
+        pad = tagged_notes(("one", "a"), ("two", "b"))
+        self.assertEqual(notebook.select_note(pad, "@2").text, "two")
+        self.assertEqual(notebook.select_note(pad, "@7"), "@7")
+        self.assertEqual(notebook.select_note(pad, "@x"), "@x")
+
+
+class SearchTest(unittest.TestCase):
+    def test_search_follows_the_changes(self):
+        pad = NotePad()
+        for text in ("buy milk", "buy bread", "call mom"):
+            pad.add_note(Note(text))
+        self.assertEqual([note.text for note in pad.search("buy milk")], ["buy milk"])
+        pad.change_note(pad.find("buy milk"), "buy tea")
+        self.assertEqual(pad.search("milk "), [])
+        self.assertEqual(sorted(note.text for note in pad.search("buy ")), ["buy bread", "buy tea"])
+        pad.delete(pad.find("buy bread"))
+        self.assertEqual([note.text for note in pad.search("bu")], ["buy tea"])
+        self.assertEqual([note.text for note in pad.search("?")], [])  # no words, a scan
+
+
+if __name__ == "__main__":
+    unittest.main()
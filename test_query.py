@@ -0,0 +1,65 @@
+"""query command over the field indexes: python -m unittest test_query"""
+import unittest
+
+from ab_classes import Address, AddressBook, Birthday, Email, Name, Phone, Record
+from query import Query
+
+
+def contact(name: str, *phones, email=None, address=None, birthday=None) -> Record:
+    record = Record(Name(name), email=Email(email) if email else None, address=Address(address) if address else None)
+    for number in phones:
+        record.add_phone(Phone(number))
+    if birthday:
+        record.add_birthday(Birthday(birthday))
+    return record
+
+
+class QueryTest(unittest.TestCase):
+    def setUp(self):
+        self.book = AddressBook()
+        self.book.add_record(contact("Ann", "0501234567", email="ann@Gmail.com", address="Kyiv, Main 1", birthday="02.03.1990"))
+        self.book.add_record(contact("Bob", email="bob@ukr.net", birthday="05.03.1985"))
+        self.book.add_record(contact("Cat", "0671234567", "0931234567", address="Lviv, Main 2"))
+
+    def names(self, text: str) -> list:
+        return [record.name.value for record in Query(self.book, text).run()]
+
+    def test_single_fields(self):
+        self.assertEqual(self.names("email=gmail.com"), ["Ann"])
+        self.assertEqual(self.names("email=@UKR.NET"), ["Bob"])
+        self.assertEqual(self.names("phones=2"), ["Cat"])
+        self.assertEqual(self.names("phones=-"), ["Bob"])
+        self.assertEqual(self.names("month=mar"), ["Ann", "Bob"])
+        self.assertEqual(self.names("month=-"), ["Cat"])
+        self.assertEqual(self.names("address=main"), ["Ann", "Cat"])
+        self.assertEqual(self.names("address=-"), ["Bob"])
+
+    def test_and_or_brackets(self):
+        self.assertEqual(self.names("month=3 and email=gmail.com"), ["Ann"])
+        self.assertEqual(self.names("email=- or phones=0"), ["Bob", "Cat"])
+        self.assertEqual(self.names("address=main AND (month=March or phones=2)"), ["Ann", "Cat"])
+        self.assertEqual(self.names("address=main and month=3 and phones=1 and email=ukr.net"), [])
+
+    def test_index_follows_the_changes(self):
+        self.book.get("Bob").add_phone(Phone("0991234567"))
+        self.book.remove_record("Ann")
+        self.assertEqual(self.names("phones=1"), ["Bob"])
+        self.assertEqual(self.names("month=3"), ["Bob"])
+
+    def test_most_selective_predicate_goes_first(self):
+        query = Query(self.book, "address=main and email=mail.com")
+        self.assertEqual(query.estimate(query.tree), 0)
+        self.assertEqual(query.run(), [])
+        self.assertNotIn(("address", "main"), query.sets)  # no candidates, the bigger index is never read
+        query = Query(self.book, "(month=3 or phones=2) and email=ukr.net")
+        self.assertEqual(query.estimate(query.tree[1][0]), 3)
+        self.assertEqual([record.name.value for record in query.run()], ["Bob"])
+
+    def test_errors(self):
+        for text in ("", "name=Ann", "email", "month=13", "phones=x", "(month=3", "month=3)", "month=3 or"):
+            with self.assertRaises(ValueError, msg=text):
+                Query(self.book, text).run()
+
+
+if __name__ == "__main__":
+    unittest.main()
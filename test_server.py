@@ -0,0 +1,139 @@
+"""local server mode and its client: python -m unittest test_server"""
+from threading import Lock, Thread
+from unittest import mock
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+from ab_classes import AddressBook, NotePad
+from client import MemoMindClient
+import main
+import server
+
+
+class ProtocolTest(unittest.TestCase):
+    def test_parse_address(self):
+        self.assertEqual(server.parse_address("unix:/tmp/memo.sock"), ("/tmp/memo.sock", None))
+        self.assertEqual(server.parse_address("localhost:7878"), ("localhost", 7878))
+        self.assertEqual(server.parse_address(":7878"), ("127.0.0.1", 7878))
+
+    def test_reply_lines_escape_the_dot(self):
+        self.assertEqual(list(server.reply_lines(".ok\nplain\n..x")), ["..ok", "plain", "...x"])
+
+
+class ReadWriteLockTest(unittest.TestCase):
+    def test_reads_share_and_a_write_runs_alone(self):
+        async def scenario():
+            lock = server.ReadWriteLock()
+            events = []
+
+            async def read(name):
+                await lock.acquire_read()
+                events.append(f"{name} in")
+                await asyncio.sleep(0.01)
+                events.append(f"{name} out")
+                await lock.release_read()
+
+            async def write():
+                await lock.acquire_write()
+                events.append("write in")
+                await asyncio.sleep(0.01)
+                events.append("write out")
+                await lock.release_write()
+
+            await asyncio.gather(read("a"), read("b"), write())
+            return events
+
+        events = asyncio.run(scenario())
+        self.assertEqual(events[:2], ["a in", "b in"])  # side by side
+        self.assertEqual(events[-2:], ["write in", "write out"])
+
+
+class ServerTestCase(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.address = "unix:" + os.path.join(folder.name, "memo.sock")
+        patch = mock.patch.object(main, "PAGE", 10, create=True)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.book, self.notebook = AddressBook(), NotePad()
+        self.commits = 0
+
+    def commit(self) -> None:
+        self.commits += 1
+
+    def serve(self, start=None) -> None:
+        start = start or main.locked(Lock(), lambda line: main.start_command(self.book, self.notebook, line))
+        command_server = server.CommandServer(start, main.is_read, main.is_exit, self.commit, main.failure)
+        loop = asyncio.new_event_loop()
+        thread = Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        asyncio.run_coroutine_threadsafe(command_server.serve(self.address), loop)
+
+        async def cancel_all():
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        def stop():
+            asyncio.run_coroutine_threadsafe(cancel_all(), loop).result(5)
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(5)
+            loop.close()
+
+        self.addCleanup(stop)
+        path = self.address[5:]
+        for _ in range(500):
+            if os.path.exists(path):
+                break
+            time.sleep(0.01)
+
+    def client(self) -> MemoMindClient:
+        client = MemoMindClient(self.address, timeout=5)
+        self.addCleanup(client.close)
+        return client
+
+
+class CommandServerTest(ServerTestCase):
+    def test_commands_share_the_loaded_book(self):
+        self.serve()
+        first, second = self.client(), self.client()
+        self.assertEqual(first.execute("add contact Ann 0501234567")[0], True)
+        ok, text = second.execute("phone Ann")
+        self.assertTrue(ok)
+        self.assertEqual(text, 'Contact "Ann". Current phone number +380501234567')
+        self.assertEqual(self.commits, 1)  # a read command does not commit
+        self.assertEqual(second.execute("frobnicate"), (False, "There is no such command"))
+
+    def test_answers_and_missing_answers(self):
+        self.serve()
+        client = self.client()
+        client.execute("add contact Ann")
+        ok, text = client.execute("del contact Ann")
+        self.assertFalse(ok)
+        self.assertIn("no answer for the question", text)
+        self.assertTrue(client.execute("del contact Ann | y")[0])
+        self.assertNotIn("Ann", self.book)
+
+    def test_lines_starting_with_a_dot(self):
+        self.serve(lambda line: (True, ".printed\n", iter(["..", "\n.ok"])))
+        self.assertEqual(self.client().execute("show contacts"), (True, ".printed\n..\n.ok"))
+
+    def test_exit_ends_the_connection_only(self):
+        self.serve()
+        client = self.client()
+        client.execute("add contact Ann")
+        client._send("exit")
+        with self.assertRaises(ConnectionError):
+            client._receive()
+        time.sleep(0.05)
+        self.assertTrue(client.stale())
+        self.assertEqual(client.execute("phone Ann")[0], True)  # connects again
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""SQLite storage of contacts and notes: python -m unittest test_storage"""
+from datetime import date
+import os
+import tempfile
+import unittest
+
+from ab_classes import Address, Birthday, Email, HashTag, Name, Note, Phone, Record
+from storage import SqliteAddressBook, SqliteArchive, SqliteNotePad, SqliteStorage
+
+
+class SqliteTestCase(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        self.filename = os.path.join(self.folder.name, "memomind.db")
+
+    def open(self) -> SqliteStorage:
+        storage = SqliteStorage(self.filename)
+        self.addCleanup(storage.close)
+        return storage
+
+
+class SqliteAddressBookTest(SqliteTestCase):
+    def fill(self) -> SqliteAddressBook:
+        storage = self.open()
+        book = SqliteAddressBook(storage)
+        ann = Record(Name("Ann Lee"), Phone("0501234567"), Email("ann@mail.com"), Address("Kyiv, Main 1"))
+        ann.add_birthday(Birthday("02.01.1990"))
+        book.add_record(ann)
+        book.add_record(Record(Name("Bob Ray"), Phone("0671234567")))
+        book.get("Bob Ray").add_phone(Phone("0931112233"))
+        storage.commit()
+        storage.close()
+        return SqliteAddressBook(self.open())
+
+    def test_round_trip(self):
+        book = self.fill()
+        self.assertEqual(sorted(book), ["Ann Lee", "Bob Ray"])
+        ann = book.get("Ann Lee")
+        self.assertEqual((ann.email.value, ann.address.value), ("ann@mail.com", "Kyiv, Main 1"))
+        self.assertEqual(ann.birthday.value.date(), date(1990, 1, 2))
+        self.assertEqual([phone.value for phone in book.get("Bob Ray").phones], ["+380671234567", "+380931112233"])
+
+    def test_lookups_run_on_the_tables(self):
+        book = self.fill()
+        self.assertEqual([rec.name.value for rec in book.search("mail")], ["Ann Lee"])
+        self.assertEqual([rec.name.value for _, rec in book.find_phone("1234567")], ["Ann Lee", "Bob Ray"])
+        self.assertEqual(book.fields.lookup("phones", 2), {"Bob Ray"})
+        self.assertEqual(book.fields.lookup("address", None), {"Bob Ray"})
+        self.assertEqual(book.fields.lookup("email", "mail.com"), {"Ann Lee"})
+        self.assertEqual(book.fields.lookup("month", 1), {"Ann Lee"})
+
+    def test_remove_and_pages(self):
+        book = self.fill()
+        book.add_record(Record(Name("Cat Sun")))
+        pages = book.iterator(2, by_name=True)
+        self.assertEqual([[rec.name.value for rec in page] for page in pages], [["Ann Lee", "Bob Ray"], ["Cat Sun"]])
+        book.remove_record("Bob Ray")
+        pages = book.iterator(2)
+        self.assertEqual([[rec.name.value for rec in page] for page in pages], [["Ann Lee", "Cat Sun"]])
+        self.assertEqual(book.find_phone("0671234567"), [])
+
+
+class SqliteNotePadTest(SqliteTestCase):
+    def test_notes_and_archive_survive_a_reopen(self):
+        storage = self.open()
+        notebook = SqliteNotePad(storage)
+        notebook.archive = SqliteArchive(storage)
+        for text in ("one", "two", "three"):
+            notebook.add_note(Note(text))
+        one, two, three = sorted(notebook.note_list, key=lambda note: note.id)
+        notebook.add_tag(one, HashTag("home"))
+        notebook.change_note(two, "second")
+        notebook.change_status(three, date(2020, 1, 1))
+        self.assertEqual(notebook.archive_done(30), 1)
+        storage.commit()
+        storage.close()
+        storage = self.open()
+        loaded = SqliteNotePad(storage)
+        loaded.archive = SqliteArchive(storage)
+        self.assertEqual([(note.id, note.text) for note in loaded.note_list], [(1, "one"), (2, "second")])
+        self.assertEqual([note.text for note in loaded.with_tag("#home")], ["one"])
+        self.assertEqual([note.text for note in loaded.archived()], ["three"])
+        loaded.add_note(Note("four"))
+        self.assertEqual(loaded.get(4).text, "four")  # the archived ID is not taken again
+
+
+if __name__ == "__main__":
+    unittest.main()